@@ -0,0 +1,120 @@
+"""Microbenchmark of JSON decoding for GraphQL payloads.
+
+    python benchmarks/bench_json.py [response.json ...]
+
+Without arguments a synthetic TweetDetail-shaped payload is used; pass files
+recorded by the replay server (``replay/graphql/*/*.json``) to measure real
+responses. For each available backend it reports the decode time and the
+encode time (what writing the response cache costs).
+"""
+
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.service.json_codec import BACKEND, DUMPERS, LOADERS  # noqa: E402
+
+
+def synthetic_tweet(i: int) -> dict:
+    media = {
+        "type": "photo",
+        "media_url_https": f"https://pbs.twimg.com/media/{i}.jpg",
+        "ext_media_availability": {"status": "Available"},
+        "ext": {"mediaStats": {"r": {"missing": None}, "ttl": -1}},
+        "original_info": {"height": 1080, "width": 1920, "focus_rects": []},
+        "sizes": {s: {"h": 1080, "w": 1920, "resize": "fit"} for s in "lmst"},
+    }
+    bindings = [
+        {"key": key, "value": {"string_value": f"{key} {i}" * 8, "type": "STRING"}}
+        for key in ("title", "description", "card_url", "domain", "vanity_url")
+    ] + [
+        {"key": f"thumbnail_image_{size}", "value": {"image_value": {"url": "x" * 80}}}
+        for size in ("small", "large", "x_large", "original", "color")
+    ]
+    return {
+        "__typename": "Tweet",
+        "rest_id": str(10**18 + i),
+        "core": {
+            "user_results": {
+                "result": {
+                    "legacy": {
+                        "name": f"user {i}",
+                        "screen_name": f"user{i}",
+                        "profile_image_url_https": "https://pbs.twimg.com/p.jpg",
+                        "description": "bio " * 40,
+                    },
+                    "professional": {"category": [{"name": "Science"}]},
+                    "affiliates_highlighted_label": {},
+                }
+            }
+        },
+        "card": {
+            "rest_id": "https://t.co/abc",
+            "legacy": {
+                "binding_values": bindings,
+                "card_platform": {"platform": {"audience": {"name": "production"}}},
+            },
+        },
+        "edit_control": {"edit_tweet_ids": [str(i)], "editable_until_msecs": "1"},
+        "unmention_data": {},
+        "legacy": {
+            "full_text": "text " * 50,
+            "lang": "en",
+            "created_at": "Mon Jan 01 00:00:00 +0000 2024",
+            "entities": {"media": [media] * 2, "urls": [], "hashtags": []},
+            "extended_entities": {"media": [media] * 2},
+        },
+    }
+
+
+def synthetic_payload(entries: int = 60) -> bytes:
+    items = [
+        {
+            "entryId": f"tweet-{i}",
+            "content": {
+                "itemContent": {"tweet_results": {"result": synthetic_tweet(i)}}
+            },
+        }
+        for i in range(entries)
+    ]
+    data = {
+        "data": {
+            "threaded_conversation_with_injections_v2": {
+                "instructions": [{"type": "TimelineAddEntries", "entries": items}]
+            }
+        }
+    }
+    return json.dumps(data).encode()
+
+
+def timed(func, payload, rounds: int) -> float:
+    """Median milliseconds of ``func(payload)``."""
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(payload)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    paths = sys.argv[1:]
+    payloads = [Path(p).read_bytes() for p in paths] or [synthetic_payload()]
+    rounds = 50
+    size = sum(map(len, payloads))
+    print(f"{len(payloads)} payload(s), {size / 1024:.0f} KiB, default {BACKEND}")
+
+    print(f"{'backend':<10}{'decode ms':>12}{'encode ms':>12}")
+    for name, loads in LOADERS.items():
+        dumps = DUMPERS[name]
+        decode = sum(timed(loads, p, rounds) for p in payloads)
+        encode = sum(timed(dumps, loads(p), rounds) for p in payloads)
+        print(f"{name:<10}{decode:>12.2f}{encode:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
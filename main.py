@@ -1,4 +1,5 @@
-from typing import List, Optional
+import argparse
+from typing import Dict, List, Literal, Optional
 
 from pydantic import ConfigDict, Field, field_validator
 from pydantic_settings import BaseSettings
@@ -13,6 +14,15 @@ class Settings(BaseSettings):
     endpoint: Optional[str] = Field(default=None)
     headless: bool = True
     target_url: str = "https://x.com/GrahLnn/likes"
+    engine: Literal["thread", "async"] = "thread"
+    prefetch_pages: int = 2
+    # 例如 QUEUE_CAPACITY='{"translate": 50}'，未指定的阶段使用默认容量
+    queue_capacity: Dict[str, int] = Field(default_factory=dict)
+    queue_max_bytes: Dict[str, int] = Field(default_factory=dict)
+    autoscale: bool = True
+    max_attempts: int = 3
+    download_attempts: int = 10
+    drain_timeout: float = 30
 
     model_config = ConfigDict(
         env_file=".env",
@@ -27,6 +37,14 @@ class Settings(BaseSettings):
 
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--replay-dlq",
+        action="store_true",
+        help="only retry the tweets recorded in dead_letters.jsonl, skip new likes",
+    )
+    args = parser.parse_args()
+
     # 加载环境变量配置
     settings = Settings()
 
@@ -36,8 +54,16 @@ def main():
         headless=settings.headless,
         proxies=settings.proxies,
         endpoint=settings.endpoint,
+        engine=settings.engine,
+        prefetch_pages=settings.prefetch_pages,
+        queue_capacity=settings.queue_capacity,
+        queue_max_bytes=settings.queue_max_bytes,
+        autoscale=settings.autoscale,
+        max_attempts=settings.max_attempts,
+        download_attempts=settings.download_attempts,
+        drain_timeout=settings.drain_timeout,
     )
-    results = scraper.scrape(settings.target_url)
+    results = scraper.scrape(settings.target_url, replay_dlq=args.replay_dlq)
 
 
 if __name__ == "__main__":
@@ -22,6 +22,14 @@ class ScraperFactory:
             cookies_path (str, optional): The path to the cookies file, default is "config/cookies.txt"
             save_path (str, optional): The path to save the scraped data, default is "output"
             endpoint (str, optional): The endpoint URL, default is None, set to get guest token
+            engine (str, optional): "thread" for the worker thread pipeline or "async" for the asyncio one, default is "thread"
+            prefetch_pages (int, optional): How many likes pages to fetch ahead of the pipeline, default is 2
+            queue_capacity (dict, optional): Max queued tasks per stage ("reply", "download", "describe", "translate", "persist")
+            queue_max_bytes (dict, optional): Approximate byte cap per stage queue, default is no cap
+            autoscale (bool, optional): Resize stage thread pools from queue depth, latency and key capacity, default is True
+            max_attempts (int, optional): Runs of a failing subtask before it goes to the dead-letter store, default is 3
+            download_attempts (int, optional): Runs of a failing media download before it goes to the dead-letter store, default is 10
+            drain_timeout (float, optional): Seconds Ctrl-C waits for running subtasks before checkpointing the rest, default is 30
 
         Returns:
             Optional[BaseScraper]: A scraper instance if a matching domain is found,
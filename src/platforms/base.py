@@ -1,12 +1,15 @@
+import asyncio
+import json
 import logging
+import sys
 import threading
 import time
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from pathlib import Path
-from queue import Empty, Queue
+from queue import Empty, Full, Queue
 import traceback
-from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, TypeVar
 
 from DrissionPage import Chromium
 from tqdm import tqdm
@@ -79,6 +82,88 @@ class BaseParser(ABC, Generic[T]):
         pass
 
 
+def estimate_size(item: Any) -> int:
+    """Approximate in-memory footprint of a task by its JSON length.
+
+    Items with an ``nbytes`` attribute report their own (usually cached) size,
+    so the task is not serialized again on every ``put``.
+    """
+    if (nbytes := getattr(item, "nbytes", None)) is not None:
+        return nbytes
+    try:
+        return len(json.dumps(item, ensure_ascii=False, default=str))
+    except (TypeError, ValueError):
+        return sys.getsizeof(item)
+
+
+class BoundedQueue(Queue):
+    """Queue capped by item count and, optionally, by approximate byte size.
+
+    ``put`` blocks while either cap is reached, so a slow stage pushes back on
+    the stages feeding it instead of letting its backlog grow without bound.
+    A single item larger than ``max_bytes`` is still accepted by an empty queue.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        max_bytes: int = 0,
+        sizeof: Callable[[Any], int] = estimate_size,
+    ):
+        super().__init__(maxsize)
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+
+    def _get(self):
+        item, size = self.queue.popleft()
+        self.bytes -= size
+        return item
+
+    def _is_full(self, size: int) -> bool:
+        if 0 < self.maxsize <= self._qsize():
+            return True
+        return (
+            self.max_bytes > 0 and self.bytes > 0 and self.bytes + size > self.max_bytes
+        )
+
+    def put(self, item, block: bool = True, timeout: Optional[float] = None):
+        size = self.sizeof(item) if self.max_bytes > 0 and item is not None else 0
+        with self.not_full:
+            if not block:
+                if self._is_full(size):
+                    raise Full
+            elif timeout is None:
+                while self._is_full(size):
+                    self.not_full.wait()
+            elif timeout < 0:
+                raise ValueError("'timeout' must be a non-negative number")
+            else:
+                endtime = time.monotonic() + timeout
+                while self._is_full(size):
+                    remaining = endtime - time.monotonic()
+                    if remaining <= 0.0:
+                        raise Full
+                    self.not_full.wait(remaining)
+            self._put((item, size))
+            self.bytes += size
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+
+def put_while_running(
+    queue: Queue, item: Any, running_event: threading.Event, timeout: float = 0.1
+) -> bool:
+    """Blocking put that gives up once ``running_event`` is cleared."""
+    while running_event.is_set():
+        try:
+            queue.put(item, timeout=timeout)
+            return True
+        except Full:
+            continue
+    return False
+
+
 def create_queue_worker(
     queue: Queue,
     process_func: Callable,
@@ -100,13 +185,16 @@ def create_queue_worker(
                     if task is None or not running_event.is_set():
                         break
                     process_func(task)
-                    next_queue.put(task) if next_queue else None
+                    if next_queue is not None:
+                        put_while_running(next_queue, task, running_event, timeout)
                     pbar.update(1)
                     queue.task_done()
                 except Empty:
                     continue
                 except Exception as e:
-                    logging.error(f"Error processing task {pbar.desc or ''} {task.get('rest_id')}: {e}")
+                    logging.error(
+                        f"Error processing task {pbar.desc or ''} {task.get('rest_id')}: {e}"
+                    )
                     traceback.print_exception(type(e), e, e.__traceback__)
                     continue
 
@@ -117,6 +205,113 @@ def create_queue_worker(
     return worker
 
 
+def create_async_queue_worker(
+    queue: asyncio.Queue,
+    process_func: Callable[[Any], Awaitable[None]],
+    pbar: Optional[tqdm] = None,
+    next_queue: Optional[asyncio.Queue] = None,
+):
+    """Coroutine counterpart of ``create_queue_worker``.
+
+    The returned coroutine runs until it is cancelled; every task is marked
+    done even when ``process_func`` fails so ``queue.join()`` never hangs.
+    """
+
+    async def worker():
+        while True:
+            task = await queue.get()
+            try:
+                await process_func(task)
+                if next_queue is not None:
+                    await next_queue.put(task)
+                if pbar is not None:
+                    pbar.update(1)
+            except Exception as e:
+                desc = pbar.desc if pbar is not None else ""
+                logging.error(
+                    f"Error processing task {desc} {task.get('rest_id')}: {e}"
+                )
+                traceback.print_exception(type(e), e, e.__traceback__)
+            finally:
+                queue.task_done()
+
+    return worker
+
+
+class Prefetcher(Generic[T]):
+    """Fetch cursor-paginated pages in a background thread ahead of the consumer.
+
+    ``fetch(cursor)`` returns a page and ``next_cursor(page)`` the cursor of the
+    following one, or ``None`` when paging should stop. At most ``depth`` pages
+    are buffered; iteration yields ``(cursor, page)`` pairs and re-raises any
+    error raised by ``fetch``. It ends early once ``close`` is called, even if
+    a ``fetch`` is still hanging.
+    """
+
+    _DONE = object()
+
+    def __init__(
+        self,
+        fetch: Callable[[Any], T],
+        next_cursor: Callable[[T], Any],
+        start: Any = "",
+        depth: int = 2,
+        timeout: float = 0.1,
+    ):
+        self.fetch = fetch
+        self.next_cursor = next_cursor
+        self.start = start
+        self.timeout = timeout
+        self.buffer: Queue = Queue(maxsize=max(depth, 1))
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _put(self, item) -> bool:
+        while not self._stopped.is_set():
+            try:
+                self.buffer.put(item, timeout=self.timeout)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _run(self):
+        cursor = self.start
+        try:
+            while cursor is not None and not self._stopped.is_set():
+                page = self.fetch(cursor)
+                if not self._put((cursor, page)):
+                    return
+                cursor = self.next_cursor(page)
+        except Exception as e:
+            self._put(e)
+            return
+        self._put(self._DONE)
+
+    def __iter__(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        try:
+            while not self._stopped.is_set():
+                # 轮询而不是一直阻塞，close() 或 Ctrl-C 能及时结束迭代
+                try:
+                    item = self.buffer.get(timeout=self.timeout)
+                except Empty:
+                    continue
+                if item is self._DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop fetching; a request already in flight is finished and discarded."""
+        self._stopped.set()
+
+
 class WorkerContext:
     def __init__(self):
         self.workers = []
@@ -140,7 +335,4 @@ class WorkerContext:
         for thread, _ in self.workers:
             thread.join()
 
-        # 清理队列
-        for _, queue in self.workers:
-            while not queue.empty():
-                queue.get_nowait()
+        # 队列中剩下的任务保持原样，由调用方决定是否写入检查点
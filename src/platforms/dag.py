@@ -0,0 +1,311 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import traceback
+from dataclasses import dataclass
+from pathlib import Path
+from queue import Full, Queue
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from tqdm import tqdm
+
+from .base import estimate_size, put_while_running
+from .retry import DeadLetterStore, RetryScheduler, backoff_delay
+
+
+@dataclass(frozen=True)
+class Node:
+    """One subtask of a job.
+
+    ``kind`` selects the worker pool that runs it, ``deps`` name the nodes that
+    must finish first. When a dependency fails the node is skipped, unless it
+    is marked ``always`` (e.g. saving whatever was collected). ``attempts``
+    overrides the scheduler's ``max_attempts`` for this node.
+    """
+
+    name: str
+    kind: str
+    func: Callable[[Dict], Any]
+    deps: Tuple[str, ...] = ()
+    always: bool = False
+    attempts: Optional[int] = None
+
+
+class Job:
+    """Progress of one task through its dependency graph."""
+
+    def __init__(self, task: Dict, nodes: Iterable[Node], skip: Iterable[str] = ()):
+        self.task = task
+        self.nodes: Dict[str, Node] = {node.name: node for node in nodes}
+        self.done: Set[str] = set(skip) & set(self.nodes)
+        self.failed: Set[str] = set()
+        self.started: Set[str] = set(self.done)
+        self.closed = False
+        self._nbytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def complete(self) -> bool:
+        return len(self.done) == len(self.nodes)
+
+    @property
+    def succeeded(self) -> Set[str]:
+        return self.done - self.failed
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate size of the task for byte-capped queues.
+
+        Measured the first time one of its nodes is queued and again after
+        each finished node, since nodes add their results to the task.
+        """
+        if self._nbytes is None:
+            self._nbytes = estimate_size(self.task)
+        return self._nbytes
+
+    def _advance(self) -> List[Node]:
+        """Collect nodes whose dependencies are finished, skipping failed branches."""
+        ready = []
+        changed = True
+        while changed:
+            changed = False
+            for node in self.nodes.values():
+                if node.name in self.started:
+                    continue
+                deps = [d for d in node.deps if d in self.nodes]
+                if not all(d in self.done for d in deps):
+                    continue
+                self.started.add(node.name)
+                if not node.always and any(d in self.failed for d in deps):
+                    self.done.add(node.name)
+                    self.failed.add(node.name)
+                    changed = True
+                else:
+                    ready.append(node)
+        return ready
+
+    def start(self) -> Tuple[List[Node], bool]:
+        """Nodes runnable right away, and whether the job is already complete."""
+        with self._lock:
+            return self._advance(), self._close()
+
+    def finish(self, name: str, ok: bool) -> Tuple[List[Node], bool]:
+        """Record a finished node; returns the newly runnable nodes and whether
+        this call completed the job (true exactly once)."""
+        with self._lock:
+            self.done.add(name)
+            self._nbytes = None
+            if not ok:
+                self.failed.add(name)
+            return self._advance(), self._close()
+
+    def _close(self) -> bool:
+        if self.complete and not self.closed:
+            self.closed = True
+            return True
+        return False
+
+
+class JobTask:
+    """Queue item: a node of a job waiting for a worker of its kind."""
+
+    def __init__(self, job: Job, node: Node, attempts: int = 0):
+        self.job = job
+        self.node = node
+        self.attempts = attempts
+
+    @property
+    def nbytes(self) -> int:
+        return self.job.nbytes
+
+    def __str__(self) -> str:
+        return f"{self.job.task.get('rest_id')}:{self.node.name}"
+
+
+class DagScheduler:
+    """Dispatch job nodes onto per-kind queues as their dependencies complete.
+
+    ``run`` is the ``process_func`` for the workers of every queue; it executes
+    the node and enqueues whatever became runnable.
+
+    A failed node is put back on its queue by ``retry`` after a backoff, up to
+    ``max_attempts`` runs in total (or the node's own ``attempts``); after that it is recorded in
+    ``dead_letters`` and treated as failed.
+    """
+
+    def __init__(
+        self,
+        queues: Dict[str, Queue],
+        running_event: threading.Event,
+        retry: Optional[RetryScheduler] = None,
+        max_attempts: int = 1,
+        dead_letters: Optional[DeadLetterStore] = None,
+    ):
+        self.queues = queues
+        self.running_event = running_event
+        self.retry = retry
+        self.max_attempts = max_attempts
+        self.dead_letters = dead_letters
+        self.jobs: Set[Job] = set()
+        self._cond = threading.Condition()
+
+    @property
+    def outstanding(self) -> int:
+        return len(self.jobs)
+
+    def active(self) -> List[Job]:
+        """Jobs submitted but not complete yet, e.g. to checkpoint them."""
+        with self._cond:
+            return list(self.jobs)
+
+    def submit(
+        self, task: Dict, nodes: Iterable[Node], skip: Iterable[str] = ()
+    ) -> Job:
+        job = Job(task, nodes, skip)
+        with self._cond:
+            self.jobs.add(job)
+        self._dispatch(job, *job.start())
+        return job
+
+    def run(self, item: JobTask):
+        try:
+            item.node.func(item.job.task)
+        except Exception as e:
+            item.attempts += 1
+            max_attempts = item.node.attempts or self.max_attempts
+            if self.retry is not None and item.attempts < max_attempts:
+                # 熔断打开时至少等到它放行试探请求
+                delay = max(
+                    backoff_delay(item.attempts), getattr(e, "retry_after", 0) or 0
+                )
+                logging.warning(
+                    f"Task {item} failed ({e}), retry {item.attempts} in {delay:.0f}s"
+                )
+                self.retry.call_later(delay, lambda: self._requeue(item))
+                return
+            logging.error(f"Error processing task {item}: {e}")
+            traceback.print_exception(type(e), e, e.__traceback__)
+            if self.dead_letters is not None:
+                self.dead_letters.add(
+                    item.job.task.get("rest_id"), item.node.name, e, item.attempts
+                )
+            self._dispatch(item.job, *item.job.finish(item.node.name, False))
+            return
+        self._dispatch(item.job, *item.job.finish(item.node.name, True))
+
+    def _requeue(self, item: JobTask):
+        """Runs on the timer thread, so it must not block on a full queue."""
+        if not self.running_event.is_set():
+            return
+        try:
+            self.queues[item.node.kind].put_nowait(item)
+        except Full:
+            self.retry.call_later(1, lambda: self._requeue(item))
+
+    def _dispatch(self, job: Job, ready: List[Node], completed: bool):
+        for node in ready:
+            put_while_running(
+                self.queues[node.kind], JobTask(job, node), self.running_event
+            )
+        if completed:
+            with self._cond:
+                self.jobs.discard(job)
+                self._cond.notify_all()
+
+    def join(self, timeout: float = 0.5) -> bool:
+        """Wait until every submitted job is complete or the run is stopped."""
+        with self._cond:
+            while self.outstanding and self.running_event.is_set():
+                self._cond.wait(timeout)
+            return not self.outstanding
+
+
+class JobCheckpoint:
+    """Unfinished jobs written on interrupt and picked up by the next run.
+
+    Each line holds the task with whatever its finished nodes already filled
+    in, and the names of those nodes, so resuming does not redo them.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def save(self, jobs: Iterable[Job]):
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for job in jobs:
+                record = {"task": job.task, "done": sorted(job.succeeded)}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> List[Tuple[Dict, Set[str]]]:
+        if not self.path.exists():
+            return []
+        with open(self.path, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        return [(r["task"], set(r["done"])) for r in records]
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
+
+
+async def arun_graph(
+    job: Job,
+    limits: Dict[str, asyncio.Semaphore],
+    pbars: Optional[Dict[str, tqdm]] = None,
+    max_attempts: int = 1,
+    dead_letters: Optional[DeadLetterStore] = None,
+) -> bool:
+    """Run a job's coroutine nodes concurrently, each as soon as its deps finish.
+
+    ``limits`` caps how many nodes of each kind run at once across all jobs.
+    Failed nodes are retried like ``DagScheduler`` does, sleeping outside the
+    limit. Returns whether every node succeeded.
+    """
+    task = job.task
+    skip = set(job.done)
+    futures: Dict[str, asyncio.Task] = {}
+
+    async def run(node: Node) -> bool:
+        deps = [futures[d] for d in node.deps if d in futures]
+        deps_ok = all(await asyncio.gather(*deps))
+        if node.name in skip:
+            return True
+        if not deps_ok and not node.always:
+            return False
+        name = f"{task.get('rest_id')}:{node.name}"
+        attempts = node.attempts or max_attempts
+        for attempt in range(1, attempts + 1):
+            try:
+                async with limits[node.kind]:
+                    await node.func(task)
+                break
+            except Exception as e:
+                if attempt < attempts:
+                    delay = max(
+                        backoff_delay(attempt), getattr(e, "retry_after", 0) or 0
+                    )
+                    logging.warning(
+                        f"Task {name} failed ({e}), retry {attempt} in {delay:.0f}s"
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+                logging.error(f"Error processing task {name}: {e}")
+                traceback.print_exception(type(e), e, e.__traceback__)
+                if dead_letters is not None:
+                    dead_letters.add(task.get("rest_id"), node.name, e, attempt)
+                job.finish(node.name, False)
+                return False
+        job.finish(node.name, True)
+        if pbars and node.kind in pbars:
+            pbars[node.kind].update(1)
+        return True
+
+    # create_task 只是登记，所有 future 都创建完之后节点才开始运行
+    for node in job.nodes.values():
+        futures[node.name] = asyncio.create_task(run(node))
+    return all(await asyncio.gather(*futures.values()))
@@ -0,0 +1,146 @@
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RetryScheduler:
+    """Run callbacks after a delay from a single timer thread.
+
+    Pending calls sit in a heap ordered by due time, so waiting for a retry
+    never parks a worker thread. Callbacks run on the timer thread and must
+    be quick (e.g. re-enqueue a task).
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Callable[[], None]]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def call_later(self, delay: float, callback: Callable[[], None]):
+        with self._cond:
+            if self._stopped:
+                return
+            due = time.monotonic() + max(delay, 0)
+            heapq.heappush(self._heap, (due, next(self._seq), callback))
+            self._cond.notify()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    wait = self._heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                if self._stopped:
+                    return
+                _, _, callback = heapq.heappop(self._heap)
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Delayed callback failed: {e}")
+
+    def stop(self):
+        """Drop every pending call and end the timer thread."""
+        with self._cond:
+            self._stopped = True
+            self._heap.clear()
+            self._cond.notify()
+        self._thread.join()
+
+
+class DeadLetterStore:
+    """Tasks that kept failing, appended to a JSONL file with their error.
+
+    Each line records the task id, the step that failed, how many attempts
+    were made, the error and its traceback. ``take`` moves the entries aside
+    for a replay; they are only deleted by ``finish_replay``, so a replay
+    that crashes or is interrupted gets them again from the next ``take``.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.replaying = self.path.with_suffix(".replaying")
+        self._lock = threading.Lock()
+
+    def add(self, rest_id: str, step: str, error: BaseException, attempts: int):
+        entry = {
+            "rest_id": rest_id,
+            "step": step,
+            "attempts": attempts,
+            "error": f"{type(error).__name__}: {error}",
+            "traceback": "".join(
+                traceback.format_exception(type(error), error, error.__traceback__)
+            ),
+            "failed_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    @staticmethod
+    def _read(path: Path) -> List[Dict]:
+        if not path.exists():
+            return []
+        entries = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return entries
+
+    def entries(self) -> List[Dict]:
+        with self._lock:
+            return self._read(self.path)
+
+    def __len__(self) -> int:
+        return len(self.entries())
+
+    def take(self) -> List[Dict]:
+        """Move all entries to the replay file and return everything in it."""
+        with self._lock:
+            if self.path.exists():
+                if self.replaying.exists():
+                    # 上次重放没有完成，新的死信追加在后面
+                    with open(self.path, "r", encoding="utf-8") as src, open(
+                        self.replaying, "a", encoding="utf-8"
+                    ) as dst:
+                        dst.write(src.read())
+                    os.remove(self.path)
+                else:
+                    os.replace(self.path, self.replaying)
+            return self._read(self.replaying)
+
+    def finish_replay(self):
+        """Drop the replayed entries; tasks that failed again were re-added."""
+        with self._lock:
+            self.replaying.unlink(missing_ok=True)
+
+
+def backoff_delay(attempt: int, base: float = 5.0, cap: float = 300.0) -> float:
+    """Exponential delay before retry number ``attempt`` (1-based)."""
+    return min(base * 2 ** (attempt - 1), cap)
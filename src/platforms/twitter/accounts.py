@@ -0,0 +1,165 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def account_id(key: str) -> str:
+    """Stable id of an XPOOL entry, so the raw cookie never lands on disk."""
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+@dataclass
+class AccountHealth:
+    successes: int = 0
+    failures: int = 0
+    rate_limits: List[float] = field(default_factory=list)
+    latency: Optional[float] = None
+    remaining: Optional[int] = None
+    reset_at: Optional[float] = None
+    quarantined: Optional[str] = None
+    quarantined_at: Optional[float] = None
+
+
+class AccountScheduler:
+    """Health of every XPOOL cookie account, used to route requests.
+
+    Each account keeps its success/failure counts, recent 429 times, an EWMA
+    of its latency and the rate limit quota reported by the last response.
+    ``ranked`` orders the usable accounts best first for ``KeyManager`` to
+    pick from; an account answering 326 (locked) is quarantined and the
+    quarantine is saved to ``path`` so the next run skips it too. Replacing
+    the cookie in XPOOL gives the account a new id and lifts it.
+    """
+
+    def __init__(
+        self, keys: List[str], path: Optional[Path] = None, window: float = 3600
+    ):
+        self.keys = list(keys)
+        self.path = Path(path) if path else None
+        self.window = window
+        self._health: Dict[str, AccountHealth] = {
+            account_id(key): AccountHealth() for key in self.keys
+        }
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable account state {self.path}: {e}")
+            return
+        for aid, state in saved.items():
+            if aid in self._health:
+                self._health[aid] = AccountHealth(**state)
+
+    def _save(self):
+        """Called with the lock held."""
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({k: asdict(v) for k, v in self._health.items()}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _score(self, health: AccountHealth, now: float) -> float:
+        # 平滑后的成功率，按近期 429 次数、延迟和剩余额度打折
+        score = (health.successes + 1) / (health.successes + health.failures + 2)
+        recent = sum(now - t < self.window for t in health.rate_limits)
+        score /= 1 + recent
+        if health.latency is not None:
+            score /= 1 + health.latency
+        if health.remaining == 0 and (health.reset_at or 0) > time.time():
+            score *= 0.01
+        return score
+
+    def ranked(self) -> List[str]:
+        """Usable accounts, healthiest first."""
+        with self._lock:
+            now = time.time()
+            usable = [
+                key
+                for key in self.keys
+                if not self._health[account_id(key)].quarantined
+            ]
+            return sorted(
+                usable,
+                key=lambda key: self._score(self._health[account_id(key)], now),
+                reverse=True,
+            )
+
+    def record(
+        self,
+        key: str,
+        ok: bool,
+        latency: Optional[float] = None,
+        status_code: Optional[int] = None,
+        headers: Optional[Mapping[str, str]] = None,
+    ):
+        """Account for one request made with ``key``."""
+        with self._lock:
+            health = self._health.get(account_id(key))
+            if health is None:
+                return
+            now = time.time()
+            if ok:
+                health.successes += 1
+            else:
+                health.failures += 1
+            if status_code == 429:
+                health.rate_limits = [
+                    t for t in health.rate_limits if now - t < self.window
+                ] + [now]
+            if latency is not None:
+                health.latency = (
+                    latency
+                    if health.latency is None
+                    else 0.8 * health.latency + 0.2 * latency
+                )
+            headers = headers or {}
+            if (remaining := headers.get("x-rate-limit-remaining")) is not None:
+                health.remaining = int(remaining)
+            if (reset := headers.get("x-rate-limit-reset")) is not None:
+                health.reset_at = float(reset)
+
+    def quarantine(self, key: str, reason: str):
+        with self._lock:
+            health = self._health.get(account_id(key))
+            if health is None or health.quarantined:
+                return
+            health.quarantined = reason
+            health.quarantined_at = time.time()
+            logger.warning(f"Account {account_id(key)} quarantined: {reason}")
+            self._save()
+
+    def release(self, key: str):
+        with self._lock:
+            health = self._health.get(account_id(key))
+            if health is not None and health.quarantined:
+                health.quarantined = None
+                health.quarantined_at = None
+                self._save()
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            now = time.time()
+            return {
+                aid: {**asdict(health), "score": self._score(health, now)}
+                for aid, health in self._health.items()
+            }
+
+    def save(self):
+        with self._lock:
+            self._save()
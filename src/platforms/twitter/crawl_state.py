@@ -0,0 +1,73 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class CrawlState:
+    """Position of the likes timeline crawl, persisted as ``crawl_state.json``.
+
+    ``watermark`` is the ``sortIndex`` of the newest like seen by the last
+    completed crawl; anything at or below it is already archived.
+
+    While a crawl is running, ``cursor`` is the bottom cursor to resume from and
+    ``pending_watermark`` the watermark it will commit once it completes.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.watermark: Optional[str] = None
+        self.cursor: Optional[str] = None
+        self.pending_watermark: Optional[str] = None
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            data: Dict = json.load(f)
+        self.watermark = data.get("watermark")
+        self.cursor = data.get("cursor")
+        self.pending_watermark = data.get("pending_watermark")
+
+    def to_dict(self) -> Dict:
+        return {
+            "watermark": self.watermark,
+            "cursor": self.cursor,
+            "pending_watermark": self.pending_watermark,
+        }
+
+    def save(self):
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def resuming(self) -> bool:
+        return bool(self.cursor)
+
+    def checkpoint(self, cursor: Optional[str], pending_watermark: Optional[str]):
+        """Remember where an unfinished crawl has to continue from."""
+        self.cursor = cursor
+        self.pending_watermark = pending_watermark
+        self.save()
+
+    def complete(self, watermark: Optional[str]):
+        """Commit the watermark of a finished crawl and drop the resume point."""
+        self.watermark = watermark or self.watermark
+        self.cursor = None
+        self.pending_watermark = None
+        self.save()
+
+    def reset(self):
+        self.watermark = None
+        self.cursor = None
+        self.pending_watermark = None
+        self.path.unlink(missing_ok=True)
+
+    def is_below_watermark(self, sort_index: Optional[str]) -> bool:
+        """Whether a timeline entry was already covered by the last crawl."""
+        if not self.watermark or not sort_index:
+            return False
+        return int(sort_index) <= int(self.watermark)
@@ -1,38 +1,17 @@
 import os
 from pathlib import Path
-import traceback
+from contextlib import nullcontext
 from typing import Optional
 from urllib.parse import urlparse, parse_qsl
 
 import httpx
-from tenacity import RetryCallState, retry, stop_after_attempt, wait_exponential
 
+from src.service.http_pool import ClientPool
+from src.service.proxy_manager import ProxyManager
 
-def print_error_stack(retry_state: RetryCallState):
-    """在最终失败时打印堆栈"""
-    print(f"Maximum retry attempts reached: {retry_state.args[0]}. Printing stack trace...")
-    exc = retry_state.outcome.exception()  # 获取异常对象
-    if exc:
-        traceback.print_exception(type(exc), exc, exc.__traceback__)
 
-
-@retry(
-    stop=stop_after_attempt(10),
-    wait=wait_exponential(multiplier=1, min=4, max=660),
-    retry_error_callback=print_error_stack,
-)
-def download(url: str, save_folder: str) -> Optional[str]:
-    """
-    Download a file from the given URL and save it to the specified folder.
-    If the file already exists, skip downloading.
-
-    Args:
-        url: The URL to download from
-        save_folder: The folder path to save the downloaded file
-
-    Returns:
-        str: The path to the saved file if successful, None otherwise
-    """
+def _save_path(url: str, save_folder: str) -> str:
+    """Build the local path for ``url`` inside ``save_folder``."""
     # Create save folder if it doesn't exist
     Path(save_folder).mkdir(parents=True, exist_ok=True)
 
@@ -46,14 +25,46 @@ def download(url: str, save_folder: str) -> Optional[str]:
         filename = f"{filename}.{query_params['format']}"
 
     # Construct save path
-    save_path = os.path.join(save_folder, filename)
+    return os.path.join(save_folder, filename)
+
+
+def download(
+    url: str,
+    save_folder: str,
+    proxies: Optional[ProxyManager] = None,
+    http_pool: Optional[ClientPool] = None,
+) -> Optional[str]:
+    """
+    Download a file from the given URL and save it to the specified folder.
+    If the file already exists, skip downloading.
+
+    Only one attempt is made: a transient failure raises, and the caller
+    retries later (the DAG scheduler re-queues the node) instead of a worker
+    sleeping between attempts.
+
+    Args:
+        url: The URL to download from
+        save_folder: The folder path to save the downloaded file
+        proxies: Picks the proxy of each attempt and records how it went
+        http_pool: Shared keep-alive clients; a one-off client is used without it
+
+    Returns:
+        str: The path to the saved file, or "media unavailable" if it is gone
+    """
+    save_path = _save_path(url, save_folder)
 
     # Check if file already exists
     if os.path.exists(save_path):
         return save_path
 
     # Download the file
-    with httpx.Client() as client:
+    proxy = proxies.choose() if proxies else None
+    if http_pool is not None:
+        client_context = http_pool.client(proxy)
+    else:
+        client_context = httpx.Client(proxy=proxy)
+    tracking = proxies.track(proxy) if proxies else nullcontext()
+    with tracking, client_context as client:
         try:
             response = client.get(url)
             response.raise_for_status()  # Raise exception for bad status codes
@@ -67,3 +78,26 @@ def download(url: str, save_folder: str) -> Optional[str]:
             if e.response.status_code in [403, 307, 404]:
                 return "media unavailable"
             raise e
+
+
+async def adownload(
+    url: str, save_folder: str, client: httpx.AsyncClient
+) -> Optional[str]:
+    """Coroutine version of ``download`` using a shared ``httpx.AsyncClient``."""
+    save_path = _save_path(url, save_folder)
+
+    if os.path.exists(save_path):
+        return save_path
+
+    try:
+        response = await client.get(url)
+        response.raise_for_status()
+
+        with open(save_path, "wb") as f:
+            f.write(response.content)
+
+        return save_path
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code in [403, 307, 404]:
+            return "media unavailable"
+        raise e
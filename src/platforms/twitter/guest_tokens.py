@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from ..retry import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GuestToken:
+    value: str
+    fetched_at: float = field(default_factory=time.monotonic)
+    uses: int = 0
+
+
+class GuestTokenPool:
+    """Several guest tokens kept warm by a background thread, shared by all threads.
+
+    ``acquire`` hands tokens out round-robin and counts the requests made with
+    each. A token is replaced ahead of time once it is ``refresh_ratio`` of
+    the way to ``ttl`` or to ``max_uses``, and dropped at either limit or when
+    the caller reports it rejected, so callers only wait when the pool is
+    empty (the first call, or when the token endpoint keeps failing).
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], str],
+        size: int = 3,
+        ttl: float = 3 * 3600,
+        max_uses: int = 500,
+        refresh_ratio: float = 0.8,
+    ):
+        self.fetch = fetch
+        self.size = max(size, 1)
+        self.ttl = ttl
+        self.max_uses = max_uses
+        self.refresh_ratio = refresh_ratio
+
+        self._tokens: List[GuestToken] = []
+        self._next = 0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def _expired(self, token: GuestToken, now: float) -> bool:
+        return now - token.fetched_at >= self.ttl or token.uses >= self.max_uses
+
+    def _aging(self, token: GuestToken, now: float) -> bool:
+        return (
+            now - token.fetched_at >= self.ttl * self.refresh_ratio
+            or token.uses >= self.max_uses * self.refresh_ratio
+        )
+
+    def _prune(self, now: float):
+        self._tokens = [t for t in self._tokens if not self._expired(t, now)]
+
+    def _missing(self, now: float) -> int:
+        return self.size - sum(not self._aging(t, now) for t in self._tokens)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._refresh_loop, daemon=True)
+            self._thread.start()
+
+    def _refresh_loop(self):
+        failures = 0
+        retry_at = 0.0
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    now = time.monotonic()
+                    self._prune(now)
+                    # 获取失败后的退避期内，acquire 的唤醒也不提前重试
+                    if now < retry_at:
+                        self._cond.wait(retry_at - now)
+                        continue
+                    if self._missing(now) > 0:
+                        break
+                    # 睡到最早一个 token 需要替换时再检查
+                    due = min(
+                        t.fetched_at + self.ttl * self.refresh_ratio
+                        for t in self._tokens
+                    )
+                    self._cond.wait(max(due - now, 1))
+                if self._stopped:
+                    return
+            try:
+                value = self.fetch()
+            except Exception as e:
+                failures += 1
+                delay = backoff_delay(failures, base=2, cap=60)
+                logger.warning(
+                    f"Failed to fetch guest token ({e}), retry in {delay:.0f}s"
+                )
+                retry_at = time.monotonic() + delay
+                continue
+            failures = 0
+            with self._cond:
+                self._tokens.append(GuestToken(value))
+                # 新 token 补上之后，淘汰最老的多余 token
+                self._tokens.sort(key=lambda t: t.fetched_at)
+                while len(self._tokens) > self.size:
+                    self._tokens.pop(0)
+                self._cond.notify_all()
+
+    def acquire(self, timeout: Optional[float] = 60) -> str:
+        """Next usable token; waits for the refresher only when none is left."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._ensure_started()
+            while True:
+                now = time.monotonic()
+                self._prune(now)
+                if self._tokens:
+                    token = self._tokens[self._next % len(self._tokens)]
+                    self._next += 1
+                    token.uses += 1
+                    if self._aging(token, now):
+                        self._cond.notify_all()
+                    return token.value
+                if self._stopped:
+                    raise RuntimeError("Guest token pool is stopped")
+                self._cond.notify_all()
+                remaining = None if deadline is None else deadline - now
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("No guest token available")
+                self._cond.wait(remaining)
+
+    def invalidate(self, value: str):
+        """Drop a token the server rejected, so it is not handed out again."""
+        with self._cond:
+            self._tokens = [t for t in self._tokens if t.value != value]
+            self._cond.notify_all()
+
+    def stats(self) -> List[dict]:
+        """Age (seconds) and request count of each pooled token."""
+        with self._cond:
+            now = time.monotonic()
+            return [{"age": now - t.fetched_at, "uses": t.uses} for t in self._tokens]
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,172 @@
+import mmap
+import os
+import struct
+import threading
+from enum import IntFlag
+from pathlib import Path
+from typing import Iterable, Optional
+
+
+class Stage(IntFlag):
+    """Pipeline stages that have been completed for a tweet."""
+
+    REPLIES = 1
+    MEDIA = 2
+    DESCRIBED = 4
+    TRANSLATED = 8
+    SAVED = 16
+    REPLY_MEDIA = 32
+    REPLIES_TRANSLATED = 64
+
+
+class TweetIndex:
+    """On-disk rest_id index backed by a memory-mapped open addressing table.
+
+    Each slot stores the numeric rest_id and the ``Stage`` flags completed for
+    it, so membership and progress lookups are O(1) and need no JSON parsing.
+    Non-numeric ids (``"ad"``, ``"tweet_unavailable"``) are never indexed.
+    """
+
+    MAGIC = b"QIDX"
+    VERSION = 1
+    HEADER = struct.Struct("<4sIQQ")  # magic, version, capacity, count
+    SLOT = struct.Struct("<QI")  # rest_id, stage flags
+    MIN_CAPACITY = 1 << 12
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file = None
+        self._mm: Optional[mmap.mmap] = None
+        self.capacity = 0
+        self.count = 0
+
+        self.created = not self.path.exists()
+        if self.created:
+            self._create(self.path, self.MIN_CAPACITY)
+        self._open()
+
+    def _create(self, path: Path, capacity: int):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, capacity, 0))
+            f.truncate(self.HEADER.size + capacity * self.SLOT.size)
+
+    def _open(self):
+        self._file = open(self.path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        magic, version, self.capacity, self.count = self.HEADER.unpack_from(self._mm, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError(f"{self.path} is not a tweet index (v{self.VERSION})")
+
+    def _close_map(self):
+        if self._mm is not None:
+            self._mm.flush()
+            self._mm.close()
+            self._file.close()
+            self._mm = None
+            self._file = None
+
+    @staticmethod
+    def _key(rest_id: str) -> int:
+        return int(rest_id) if rest_id and rest_id.isdigit() else 0
+
+    def _find(self, key: int) -> int:
+        """Return the slot offset holding ``key`` or the first empty one."""
+        mask = self.capacity - 1
+        slot = (key * 0x9E3779B97F4A7C15 >> 16) & mask
+        while True:
+            offset = self.HEADER.size + slot * self.SLOT.size
+            stored, _ = self.SLOT.unpack_from(self._mm, offset)
+            if stored == key or stored == 0:
+                return offset
+            slot = (slot + 1) & mask
+
+    def _grow(self):
+        tmp_path = self.path.with_suffix(".tmp")
+        entries = []
+        for slot in range(self.capacity):
+            offset = self.HEADER.size + slot * self.SLOT.size
+            key, flags = self.SLOT.unpack_from(self._mm, offset)
+            if key:
+                entries.append((key, flags))
+
+        self._close_map()
+        self._create(tmp_path, self.capacity * 2)
+        os.replace(tmp_path, self.path)
+        self._open()
+        for key, flags in entries:
+            self.SLOT.pack_into(self._mm, self._find(key), key, flags)
+        self.count = len(entries)
+        self._write_header()
+
+    def _write_header(self):
+        self.HEADER.pack_into(
+            self._mm, 0, self.MAGIC, self.VERSION, self.capacity, self.count
+        )
+
+    def reset(self):
+        """Drop every entry, e.g. when the archive it described is gone."""
+        with self._lock:
+            self._close_map()
+            self._create(self.path, self.MIN_CAPACITY)
+            self._open()
+            self.created = True
+
+    def stages(self, rest_id: str) -> Stage:
+        """Stages already completed for ``rest_id`` (empty if unknown)."""
+        key = self._key(rest_id)
+        if not key:
+            return Stage(0)
+        with self._lock:
+            if self._mm is None:
+                return Stage(0)
+            stored, flags = self.SLOT.unpack_from(self._mm, self._find(key))
+        return Stage(flags) if stored else Stage(0)
+
+    def is_saved(self, rest_id: str) -> bool:
+        return Stage.SAVED in self.stages(rest_id)
+
+    def __contains__(self, rest_id: str) -> bool:
+        key = self._key(rest_id)
+        if not key:
+            return False
+        with self._lock:
+            if self._mm is None:
+                return False
+            stored, _ = self.SLOT.unpack_from(self._mm, self._find(key))
+        return stored == key
+
+    def __len__(self) -> int:
+        return self.count
+
+    def mark(self, rest_id: str, stage: Stage = Stage(0)):
+        """Record ``rest_id`` and add ``stage`` to its completed stages."""
+        key = self._key(rest_id)
+        if not key:
+            return
+        with self._lock:
+            if self._mm is None:
+                return
+            offset = self._find(key)
+            stored, flags = self.SLOT.unpack_from(self._mm, offset)
+            if not stored:
+                if (self.count + 1) * 2 > self.capacity:
+                    self._grow()
+                    offset = self._find(key)
+                self.count += 1
+                self._write_header()
+            self.SLOT.pack_into(self._mm, offset, key, flags | stage)
+
+    def mark_all(self, rest_ids: Iterable[str], stage: Stage = Stage(0)):
+        for rest_id in rest_ids:
+            self.mark(rest_id, stage)
+
+    def flush(self):
+        with self._lock:
+            if self._mm is not None:
+                self._mm.flush()
+
+    def close(self):
+        with self._lock:
+            self._close_map()
@@ -0,0 +1,83 @@
+from typing import Dict, Iterable, List, Set
+
+from src.service.helper import get
+
+from .index import Stage
+
+
+def media_owners(tweet: Dict) -> List[Dict]:
+    """The tweet itself and its quote, if the quote is still available."""
+    owners = [tweet]
+    if (quote := tweet.get("quote")) and quote.get("rest_id") != "tweet_unavailable":
+        owners.append(quote)
+    return owners
+
+
+def conversation_items(tweet: Dict) -> Iterable[Dict]:
+    for reply in tweet.get("replies") or []:
+        yield from reply.get("conversation") or []
+
+
+def needs_download(media: Dict) -> bool:
+    return not media.get("path") or (
+        media.get("thumb")
+        and not media.get("thumb_path")
+        and media.get("path") != "media unavailable"
+    )
+
+
+def needs_description(media: Dict) -> bool:
+    # 超过 5 分钟的视频和下载失败的媒体不做描述
+    if media.get("description") or media.get("path") == "media unavailable":
+        return False
+    if media.get("type") == "video":
+        return (media.get("duration_millis") or 0) <= 5 * 60 * 1000
+    return True
+
+
+def needs_translation(tweet: Dict) -> bool:
+    return any(
+        get(tweet, f"{prefix}.text") and not get(tweet, f"{prefix}.translation")
+        for prefix in ("content", "quote.content")
+    )
+
+
+def _avatars_done(tweet: Dict) -> bool:
+    return all(get(owner, "author.avatar.path") for owner in media_owners(tweet))
+
+
+def _media_done(tweet: Dict) -> bool:
+    return not any(
+        needs_download(media)
+        for owner in media_owners(tweet)
+        for media in owner.get("media") or []
+    )
+
+
+def completed_nodes(task: Dict, stages: Stage = Stage(0)) -> Set[str]:
+    """Names of the tweet graph nodes whose result is already in ``task``.
+
+    Mirrors the checks each stage does before working, so a saved record can
+    be inspected once instead of being walked through every stage again.
+    ``stages`` are the index flags of the tweet; they are needed for replies,
+    since an empty reply list is stripped when the archive is written.
+    ``persist`` is never reported; it is needed whenever anything else is.
+    """
+    medias = [m for owner in media_owners(task) for m in owner.get("media") or []]
+    done = set()
+    if "replies" in task or Stage.REPLIES in stages:
+        done.add("replies")
+        items = list(conversation_items(task))
+        if all(_avatars_done(i) and _media_done(i) for i in items):
+            done.add("reply_media")
+        if not any(map(needs_translation, items)):
+            done.add("translate_replies")
+    if _avatars_done(task):
+        done.add("avatars")
+    if _media_done(task):
+        done.add("media")
+    if not any(map(needs_description, medias)):
+        done.add("describe")
+    if not needs_translation(task):
+        done.add("translate")
+    return done
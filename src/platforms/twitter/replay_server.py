@@ -0,0 +1,323 @@
+"""Stand-in for the X GraphQL API, for offline load tests.
+
+Record real traffic once, then replay it as fast (or as badly) as needed::
+
+    python -m src.platforms.twitter.replay_server --mode record --dir replay
+    python -m src.platforms.twitter.replay_server --dir replay --latency 0.2 \\
+        --rate-limit 150 --p429 0.02 --p326 0.001
+
+and point the client at it with ``API_BASE_URL=http://127.0.0.1:8787``.
+
+Served routes are the ``Likes``, ``TweetDetail``, ``TweetResultByRestId`` and
+``UserByRestId`` GraphQL operations, guest token activation, and media under
+``/media/<host>/<path>``. Media URLs inside served JSON are rewritten to that
+route, so downloads go through the server too. In record mode every request
+is forwarded upstream and successful responses are stored; in replay mode
+they are served from the store, with fault injection on top.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ("Likes", "TweetDetail", "TweetResultByRestId", "UserByRestId")
+MEDIA_HOSTS = ("pbs.twimg.com", "video.twimg.com")
+UPSTREAM = {"/1.1/": "https://api.twitter.com", "/i/api/": "https://x.com"}
+# 转发时不原样带回的响应头，由本服务重新计算
+HOP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+def request_key(operation: str, query: str) -> str:
+    """Store key of a GraphQL request: the operation and what it asks for."""
+    params = parse_qs(query)
+    try:
+        variables = json.loads(params.get("variables", ["{}"])[0])
+    except ValueError:
+        variables = {}
+    parts = [
+        operation,
+        str(variables.get("focalTweetId") or variables.get("tweetId") or ""),
+        str(variables.get("userId") or ""),
+        str(variables.get("cursor") or ""),
+    ]
+    return hashlib.sha1("\0".join(parts).encode()).hexdigest()
+
+
+class ResponseStore:
+    """Recorded responses: JSON bodies by request key, media bytes by URL."""
+
+    def __init__(self, folder: Path):
+        self.folder = Path(folder)
+
+    def _graphql_path(self, operation: str, key: str) -> Path:
+        return self.folder / "graphql" / operation / f"{key}.json"
+
+    def _media_path(self, url: str) -> Path:
+        digest = hashlib.sha1(url.encode()).hexdigest()
+        return self.folder / "media" / digest[:2] / digest
+
+    def get_graphql(self, operation: str, key: str) -> Optional[Dict]:
+        path = self._graphql_path(operation, key)
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def put_graphql(self, operation: str, key: str, body: Dict):
+        path = self._graphql_path(operation, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(body, f, ensure_ascii=False)
+
+    def get_media(self, url: str) -> Optional[Tuple[bytes, str]]:
+        path = self._media_path(url)
+        if not path.exists():
+            return None
+        content_type = path.with_suffix(".type").read_text(encoding="utf-8")
+        return path.read_bytes(), content_type
+
+    def put_media(self, url: str, content: bytes, content_type: str):
+        path = self._media_path(url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        path.with_suffix(".type").write_text(content_type, encoding="utf-8")
+
+
+class Faults:
+    """Latency, per-account rate limits, random 429s and sticky 326 lockouts."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_limit: int = 0,
+        window: float = 900,
+        p429: float = 0.0,
+        p326: float = 0.0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.window = window
+        self.p429 = p429
+        self.p326 = p326
+        self._windows: Dict[Tuple[str, str], Tuple[int, float]] = {}
+        self._locked = set()
+        self._lock = threading.Lock()
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(max(self.latency + random.uniform(-1, 1) * self.jitter, 0))
+
+    def locked(self, account: str) -> bool:
+        """Whether ``account`` is locked out; the first lockout sticks."""
+        with self._lock:
+            if account not in self._locked and random.random() < self.p326:
+                self._locked.add(account)
+            return account in self._locked
+
+    def budget(self, account: str, operation: str) -> Tuple[bool, Dict[str, str]]:
+        """Spend one request of the window; returns (allowed, rate limit headers)."""
+        if not self.rate_limit:
+            return random.random() >= self.p429, {}
+        with self._lock:
+            now = time.time()
+            used, reset_at = self._windows.get((account, operation), (0, 0.0))
+            if now >= reset_at:
+                used, reset_at = 0, now + self.window
+            allowed = used < self.rate_limit and random.random() >= self.p429
+            used += allowed
+            self._windows[(account, operation)] = (used, reset_at)
+        headers = {
+            "x-rate-limit-limit": str(self.rate_limit),
+            "x-rate-limit-remaining": str(self.rate_limit - used),
+            "x-rate-limit-reset": str(math.ceil(reset_at)),
+        }
+        return allowed, headers
+
+
+def account_of(headers) -> str:
+    """The auth_token cookie, or the guest token for guest requests."""
+    for pair in (headers.get("cookie") or "").split(";"):
+        name, _, value = pair.strip().partition("=")
+        if name == "auth_token":
+            return value
+    return headers.get("x-guest-token") or "anonymous"
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    server: "ReplayServer"
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send(self, status: int, body: bytes, content_type: str, headers=None):
+        self.send_response(status)
+        self.send_header("content-type", content_type)
+        self.send_header("content-length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, data: Dict, headers=None):
+        text = self.server.rewrite_media(json.dumps(data, ensure_ascii=False))
+        self._send(status, text.encode(), "application/json", headers)
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def _handle(self):
+        url = urlsplit(self.path)
+        if url.path.startswith("/media/"):
+            return self._media(url.path[len("/media/") :], url.query)
+        if url.path.endswith("/guest/activate.json"):
+            return self._guest_token()
+        operation = url.path.rsplit("/", 1)[-1]
+        if operation in OPERATIONS:
+            return self._graphql(operation, url.query)
+        self._send_json(404, {"errors": [{"message": f"Unknown route {url.path}"}]})
+
+    def _guest_token(self):
+        if self.server.mode == "record":
+            return self._forward(record=None)
+        self._send_json(200, {"guest_token": uuid.uuid4().hex[:19]})
+
+    def _graphql(self, operation: str, query: str):
+        key = request_key(operation, query)
+        if self.server.mode == "record":
+            return self._forward(record=(operation, key))
+
+        faults = self.server.faults
+        faults.delay()
+        account = account_of(self.headers)
+        allowed, headers = faults.budget(account, operation)
+        if not allowed:
+            body = {"errors": [{"code": 88, "message": "Rate limit exceeded"}]}
+            return self._send_json(429, body, headers)
+        if "cookie" in self.headers and faults.locked(account):
+            body = {"errors": [{"code": 326, "message": "Account is locked"}]}
+            return self._send_json(200, body, headers)
+        recorded = self.server.store.get_graphql(operation, key)
+        if recorded is None:
+            body = {"errors": [{"code": 144, "message": "No recorded response"}]}
+            # 144 是 X 对不存在推文的回应，客户端会按缺失处理
+            return self._send_json(200, body, headers)
+        self._send_json(200, recorded, headers)
+
+    def _media(self, target: str, query: str):
+        url = f"https://{target}" + (f"?{query}" if query else "")
+        if self.server.mode == "replay":
+            self.server.faults.delay()
+        recorded = self.server.store.get_media(url)
+        if recorded is None and self.server.mode == "record":
+            response = self.server.upstream.get(url)
+            if response.status_code == 200:
+                content_type = response.headers.get("content-type", "")
+                self.server.store.put_media(url, response.content, content_type)
+                recorded = response.content, content_type
+        if recorded is None:
+            return self._send(404, b"", "text/plain")
+        self._send(200, *recorded)
+
+    def _forward(self, record: Optional[Tuple[str, str]]):
+        base = next(b for p, b in UPSTREAM.items() if self.path.startswith(p))
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in ("host",)}
+        length = int(self.headers.get("content-length") or 0)
+        response = self.server.upstream.request(
+            self.command,
+            base + self.path,
+            headers=headers,
+            content=self.rfile.read(length) if length else None,
+        )
+        if record and response.status_code == 200:
+            data = response.json()
+            if data.get("data"):
+                self.server.store.put_graphql(*record, data)
+        headers = {
+            k: v for k, v in response.headers.items() if k.lower() not in HOP_HEADERS
+        }
+        headers.pop("content-type", None)
+        content_type = response.headers.get("content-type", "application/json")
+        body = self.server.rewrite_media(response.text).encode()
+        self._send(response.status_code, body, content_type, headers)
+
+
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        store: ResponseStore,
+        mode: str = "replay",
+        faults: Optional[Faults] = None,
+    ):
+        super().__init__(address, ReplayHandler)
+        self.store = store
+        self.mode = mode
+        self.faults = faults or Faults()
+        self.upstream = httpx.Client(timeout=30) if mode == "record" else None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def rewrite_media(self, text: str) -> str:
+        for host in MEDIA_HOSTS:
+            text = text.replace(f"https://{host}/", f"{self.base_url}/media/{host}/")
+        return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mode", choices=("replay", "record"), default="replay")
+    parser.add_argument("--dir", default="replay", help="where responses are stored")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument(
+        "--rate-limit", type=int, default=0, help="requests per account and window"
+    )
+    parser.add_argument("--window", type=float, default=900, help="seconds")
+    parser.add_argument("--p429", type=float, default=0.0, help="random 429 rate")
+    parser.add_argument("--p326", type=float, default=0.0, help="lockout rate")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    faults = Faults(
+        args.latency, args.jitter, args.rate_limit, args.window, args.p429, args.p326
+    )
+    server = ReplayServer(
+        (args.host, args.port), ResponseStore(Path(args.dir)), args.mode, faults
+    )
+    logger.info(f"{args.mode} server on {server.base_url}, store {args.dir}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from src.service.json_codec import dumps, loads
+
+
+class ResponseCache:
+    """Raw GraphQL responses on disk, gzip-compressed, one file per request.
+
+    Entries are keyed by (endpoint, tweet id, cursor) and considered fresh
+    for ``ttl`` seconds (a negative ttl never expires). Stale entries are kept
+    together with the ``ETag`` / ``Last-Modified`` validators of the response,
+    so the caller can revalidate them with a conditional request.
+    """
+
+    def __init__(self, folder: str, ttl: float):
+        self.folder = Path(folder)
+        self.ttl = ttl
+
+    def _path(self, endpoint: str, tweet_id: str, cursor: str = "") -> Path:
+        digest = hashlib.sha1(f"{endpoint}\0{tweet_id}\0{cursor}".encode()).hexdigest()
+        return self.folder / endpoint / digest[:2] / f"{digest}.json.gz"
+
+    def get(
+        self, endpoint: str, tweet_id: str, cursor: str = ""
+    ) -> Tuple[Optional[Dict[str, Any]], bool, Dict[str, str]]:
+        """Return ``(data, fresh, validators)``; data is None on a miss."""
+        path = self._path(endpoint, tweet_id, cursor)
+        try:
+            age = time.time() - path.stat().st_mtime
+            with gzip.open(path, "rb") as f:
+                entry = loads(f.read())
+        except (OSError, EOFError, ValueError):
+            return None, False, {}
+        fresh = self.ttl < 0 or age < self.ttl
+        return entry["data"], fresh, entry.get("validators", {})
+
+    def put(
+        self,
+        endpoint: str,
+        tweet_id: str,
+        cursor: str,
+        data: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        headers = headers or {}
+        validators = {
+            k: headers[k] for k in ("etag", "last-modified") if headers.get(k)
+        }
+        path = self._path(endpoint, tweet_id, cursor)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with gzip.open(tmp_path, "wb") as f:
+            f.write(dumps({"data": data, "validators": validators}))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def conditional_headers(validators: Dict[str, str]) -> Dict[str, str]:
+        headers = {}
+        if etag := validators.get("etag"):
+            headers["If-None-Match"] = etag
+        if modified := validators.get("last-modified"):
+            headers["If-Modified-Since"] = modified
+        return headers
@@ -1,28 +1,91 @@
-import json
+import asyncio
+import inspect
+import logging
+import math
 import signal
 import sys
 import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from enum import Enum
-from pathlib import Path
-from queue import Queue
-from typing import Callable, Dict, List, Optional, Union
+from queue import Full, Queue
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
 from urllib.parse import urlsplit
 
+import httpx
 from tqdm import tqdm
 
 from src.service.helper import get, remove_none_values
 from src.service.keyword_processer import KeywordProcesser
+from src.service.llm import LLMFactory
 from src.service.media_processer import MediaProcessor
 from src.service.translator import Translator
 
-from ..base import BaseScraper, WorkerContext, create_queue_worker
-from .download_media import download
+from ..dag import DagScheduler, Job, JobCheckpoint, Node, arun_graph
+from ..retry import DeadLetterStore, RetryScheduler
+from ..base import (
+    BaseScraper,
+    BoundedQueue,
+    Prefetcher,
+    WorkerContext,
+    create_async_queue_worker,
+    create_queue_worker,
+)
+from .download_media import adownload, download
 from .html_generator import generate_html
 from .parser import TwitterCellParser
-from .tw_api import TwitterAPI
+from .planner import (
+    completed_nodes,
+    conversation_items,
+    media_owners,
+    needs_description,
+)
+from .crawl_state import CrawlState
+from .index import Stage, TweetIndex
+from .store import TweetStore
+from .tw_api import AsyncTwitterAPI, TwitterAPI, shared_accounts, shared_pooled_api
 from .utils import rm_mention
 
+logger = logging.getLogger(__name__)
+
+# async 引擎中同时处理的推文数
+ASYNC_TWEET_WORKERS = 400
+
+# async 引擎中每类子任务的并发上限，与线程引擎的线程数对应
+ASYNC_STAGE_LIMITS = {
+    "reply": 200,
+    "download": 200,
+    "describe": 20,
+    "translate": 1,
+    "persist": 1,
+}
+# 同步实现的阶段在各自的线程池中运行，线程数等于并发上限
+ASYNC_THREAD_STAGES = ("describe", "translate", "persist")
+
+# 各阶段输入队列的默认容量，队列满时上游阶段会阻塞等待
+DEFAULT_QUEUE_CAPACITY = {
+    "reply": 200,
+    "download": 200,
+    "describe": 200,
+    "translate": 100,
+    "persist": 100,
+}
+
+
+def raise_first(results: List):
+    """Raise the first exception in ``results``, after every item was attempted.
+
+    Downloads of one node are independent, so one failing file must not keep
+    the others from being fetched before the node is retried.
+    """
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if len(errors) > 1:
+        logger.warning(f"{len(errors)} downloads failed, first: {errors[0]}")
+    if errors:
+        raise errors[0]
+
 
 class TweetFields(str, Enum):
     """Tweet data fields enum"""
@@ -34,7 +97,11 @@ class TweetFields(str, Enum):
 
 
 class Worker:
-    """Represents a worker that processes tasks from a queue."""
+    """Represents a worker that processes tasks from a queue.
+
+    The pool starts with ``num_threads`` threads and may be resized between
+    ``min_threads`` and ``max_threads`` by ``WorkerManager``'s autoscaler.
+    """
 
     def __init__(
         self,
@@ -44,38 +111,93 @@ class Worker:
         running_event: threading.Event,
         pbar: tqdm = None,
         next_queue: Optional[Queue] = None,
+        min_threads: Optional[int] = None,
+        max_threads: Optional[int] = None,
+        capacity: Optional[Callable[[], Optional[int]]] = None,
     ):
         self.queue = queue
         self.process_func = process_func
         self.num_threads = num_threads
+        self.min_threads = num_threads if min_threads is None else min_threads
+        self.max_threads = num_threads if max_threads is None else max_threads
+        self.capacity = capacity
         self.pbar = pbar
         self.running_event = running_event
         self.threads: List[threading.Thread] = []
         self.next_queue = next_queue
 
+        self.busy = 0
+        self.latency: Optional[float] = None  # 单个任务耗时的滑动平均（秒）
+        self.idle_ticks = 0
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return getattr(self.pbar, "desc", None) or "worker"
+
+    def _timed(self, task):
+        with self._lock:
+            self.busy += 1
+        start = time.monotonic()
+        try:
+            self.process_func(task)
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self.busy -= 1
+                self.latency = (
+                    elapsed
+                    if self.latency is None
+                    else 0.8 * self.latency + 0.2 * elapsed
+                )
+
+    def _spawn(self):
+        worker_func = create_queue_worker(
+            queue=self.queue,
+            process_func=self._timed,
+            running_event=self.running_event,
+            pbar=self.pbar,
+            next_queue=self.next_queue,
+        )
+        thread = threading.Thread(target=worker_func, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def alive(self) -> int:
+        self.threads = [t for t in self.threads if t.is_alive()]
+        return len(self.threads)
+
     def start(self):
         """Start worker threads."""
         for _ in range(self.num_threads):
-            worker_func = create_queue_worker(
-                queue=self.queue,
-                process_func=self.process_func,
-                running_event=self.running_event,
-                pbar=self.pbar,
-                next_queue=self.next_queue,
-            )
-            thread = threading.Thread(target=worker_func, daemon=True)
-            thread.start()
-            self.threads.append(thread)
+            self._spawn()
+
+    def resize(self, target: int):
+        """Grow to ``target`` threads, or retire the surplus via sentinels."""
+        current = self.alive()
+        for _ in range(target - current):
+            self._spawn()
+        for _ in range(current - target):
+            try:
+                self.queue.put_nowait(None)
+            except Full:
+                break
+        self.num_threads = target
 
     def stop(self):
         """Stop worker threads by sending sentinel and joining them."""
-        for _ in self.threads:
+        for _ in range(self.alive()):
             self.queue.put(None)
         for thread in self.threads:
             while thread.is_alive():
                 thread.join(timeout=0.1)
         # self.pbar.close() if self.pbar is not None else None
 
+    def join(self, deadline: float):
+        """Wait, until ``deadline`` (monotonic), for threads to finish their task."""
+        for thread in self.threads:
+            thread.join(timeout=max(deadline - time.monotonic(), 0))
+
     def force_stop(self):
         for thread in self.threads:
             thread.join(timeout=0)
@@ -83,10 +205,32 @@ class Worker:
 
 
 class WorkerManager:
-    """Manages multiple Worker instances."""
+    """Manages multiple Worker instances.
+
+    A background thread resizes every pool that has a ``min_threads`` /
+    ``max_threads`` range, once per ``interval`` seconds:
 
-    def __init__(self):
+    - grow when tasks are waiting and every thread is busy, to roughly the
+      number of threads that drains the backlog within ``drain_seconds`` at
+      the observed per-task latency;
+    - never grow past what the pool's key capacity can serve;
+    - shrink to the busy count after ``idle_ticks`` ticks without backlog.
+    """
+
+    def __init__(
+        self,
+        autoscale: bool = True,
+        interval: float = 2.0,
+        drain_seconds: float = 10.0,
+        idle_ticks: int = 3,
+    ):
         self.workers: List[Worker] = []
+        self.autoscale = autoscale
+        self.interval = interval
+        self.drain_seconds = drain_seconds
+        self.idle_ticks = idle_ticks
+        self._stop_scaling = threading.Event()
+        self._scaler: Optional[threading.Thread] = None
 
     def add_worker(
         self,
@@ -96,10 +240,21 @@ class WorkerManager:
         running_event: threading.Event,
         pbar: tqdm = None,
         next_queue: Optional[Queue] = None,
+        min_threads: Optional[int] = None,
+        max_threads: Optional[int] = None,
+        capacity: Optional[Callable[[], Optional[int]]] = None,
     ):
         """Add a new worker to the manager."""
         worker = Worker(
-            queue, process_func, num_threads, running_event, pbar, next_queue=next_queue
+            queue,
+            process_func,
+            num_threads,
+            running_event,
+            pbar,
+            next_queue=next_queue,
+            min_threads=min_threads,
+            max_threads=max_threads,
+            capacity=capacity,
         )
         self.workers.append(worker)
 
@@ -107,26 +262,97 @@ class WorkerManager:
         """Start all workers."""
         for worker in self.workers:
             worker.start()
+        if self.autoscale and any(w.min_threads != w.max_threads for w in self.workers):
+            self._scaler = threading.Thread(target=self._scale_loop, daemon=True)
+            self._scaler.start()
 
     def stop_all(self):
         """Stop all workers."""
+        self._stop_scaling.set()
+        if self._scaler is not None:
+            self._scaler.join()
         for worker in self.workers:
             worker.stop()
 
+    def join_all(self, timeout: float):
+        """Let running tasks finish after the running event was cleared."""
+        self._stop_scaling.set()
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            worker.join(deadline)
+
     def force_stop_all(self):
+        self._stop_scaling.set()
         for worker in self.workers:
             worker.force_stop()
 
+    def _scale_loop(self):
+        while not self._stop_scaling.wait(self.interval):
+            for worker in self.workers:
+                if worker.min_threads != worker.max_threads:
+                    try:
+                        self._scale(worker)
+                    except Exception as e:
+                        logger.error(f"autoscale {worker.name} failed: {e}")
+
+    def _target(self, worker: Worker, depth: int, capacity: Optional[int]) -> int:
+        current = worker.alive()
+        if depth and worker.busy >= current:
+            worker.idle_ticks = 0
+            latency = worker.latency or self.interval
+            target = max(current + 1, math.ceil(depth * latency / self.drain_seconds))
+            # 每次最多翻倍，避免一次性拉起过多线程
+            target = min(target, current * 2)
+        elif not depth:
+            worker.idle_ticks += 1
+            target = worker.busy if worker.idle_ticks >= self.idle_ticks else current
+        else:
+            worker.idle_ticks = 0
+            target = current
+        if capacity is not None:
+            target = min(target, max(capacity, worker.busy))
+        return max(worker.min_threads, min(worker.max_threads, target))
+
+    def _scale(self, worker: Worker):
+        depth = worker.queue.qsize()
+        capacity = worker.capacity() if worker.capacity is not None else None
+        current = worker.alive()
+        target = self._target(worker, depth, capacity)
+        if target == current:
+            return
+        logger.info(
+            f"autoscale {worker.name}: {current} -> {target} threads "
+            f"(depth={depth}, busy={worker.busy}, "
+            f"latency={worker.latency or 0:.2f}s, capacity={capacity})"
+        )
+        worker.resize(target)
+
 
 class TwitterScraper(BaseScraper[Dict, TwitterCellParser]):
     """Twitter scraper implementation for extracting tweet data"""
 
     platform = "twitter"
 
-    def __init__(self, **kwargs):
+    def __init__(
+        self,
+        engine: str = "thread",
+        prefetch_pages: int = 2,
+        queue_capacity: Optional[Dict[str, int]] = None,
+        queue_max_bytes: Optional[Dict[str, int]] = None,
+        autoscale: bool = True,
+        max_attempts: int = 3,
+        download_attempts: int = 10,
+        drain_timeout: float = 30,
+        **kwargs,
+    ):
         print("preparations in progress...")
         super().__init__(**kwargs)
 
+        if engine not in ("thread", "async"):
+            raise ValueError(f"Unknown engine: {engine}, expected 'thread' or 'async'")
+        self.engine = engine
+        self.prefetch_pages = prefetch_pages
+
         self.tweets: List[Dict] = []
         self.on_relocating = False
         self.data_folder = ""
@@ -134,65 +360,127 @@ class TwitterScraper(BaseScraper[Dict, TwitterCellParser]):
         self.parser = TwitterCellParser()
         self.twitter_api = TwitterAPI(proxies=self.proxies, endpoint=self.endpoint)
 
-        self.worker_manager = WorkerManager()
-        self.media_data_queue = Queue()
-        self.media_desc_queue = Queue()
-        self.translate_queue = Queue()
+        self.queue_capacity = {**DEFAULT_QUEUE_CAPACITY, **(queue_capacity or {})}
+        self.queue_max_bytes = queue_max_bytes or {}
+
+        self._running = threading.Event()
+        self._running.set()
+
+        self.worker_manager = WorkerManager(autoscale=autoscale)
+        self.media_data_queue = self._stage_queue("download")
+        self.media_desc_queue = self._stage_queue("describe")
+        self.translate_queue = self._stage_queue("translate")
         self.keyword_queue = Queue()
-        self.conversation_queue = Queue()
+        self.conversation_queue = self._stage_queue("reply")
+        self.persist_queue = self._stage_queue("persist")
+        self.max_attempts = max_attempts
+        self.download_attempts = download_attempts
+        self.drain_timeout = drain_timeout
+        self.retry = RetryScheduler()
+        self.scheduler = DagScheduler(
+            queues={
+                "reply": self.conversation_queue,
+                "download": self.media_data_queue,
+                "describe": self.media_desc_queue,
+                "translate": self.translate_queue,
+                "persist": self.persist_queue,
+            },
+            running_event=self._running,
+            retry=self.retry,
+            max_attempts=max_attempts,
+        )
+        self.store: Optional[TweetStore] = None
+        self.index: Optional[TweetIndex] = None
+        self.crawl_state: Optional[CrawlState] = None
+        # 时间线已读完，等待流水线排空后提交的水位线
+        self.crawl_finished = False
+        self.crawl_newest: Optional[str] = None
+        self.dead_letters: Optional[DeadLetterStore] = None
+        # 只重放死信时为需要重试的 rest_id 集合
+        self.replay_ids: Optional[Set[str]] = None
+        self.inflight: Optional[JobCheckpoint] = None
+        # 从上次中断的检查点恢复的推文，时间线和已保存数据中不再重复提交
+        self.resumed_ids: Set[str] = set()
+        self._async_jobs: Set[Job] = set()
+        self._stage_executors: Dict[str, ThreadPoolExecutor] = {}
 
         self.media_desc_cache = {}
         self.pbars: List[tqdm] = []
-
-        self._running = threading.Event()
-        self._running.set()
         # clean_all_uploaded_files()
 
+    def _stage_queue(self, stage: str) -> BoundedQueue:
+        return BoundedQueue(
+            maxsize=self.queue_capacity.get(stage, 0),
+            max_bytes=self.queue_max_bytes.get(stage, 0),
+        )
+
     def _regist_pbar(self, desc: str) -> tqdm:
         pbar = tqdm(desc=desc, position=len(self.pbars))
         self.pbars.append(pbar)
         return pbar
 
     def _start_workers(self):
-        """Initialize and start all worker threads."""
+        """Initialize and start all worker threads.
+
+        Every pool runs ``self.scheduler.run``: a worker executes one subtask of
+        a tweet and the scheduler enqueues whatever that unblocked. Thread
+        counts are the starting sizes; pools with a min/max range are resized
+        by the autoscaler, capped by the keys available to their API.
+        """
 
         self.worker_manager.add_worker(
             queue=self.conversation_queue,
-            process_func=self._add_reply,
+            process_func=self.scheduler.run,
             num_threads=20,
+            min_threads=4,
+            max_threads=60,
+            capacity=self._reply_capacity,
             pbar=self._regist_pbar("Get full reply"),
             running_event=self._running,
-            next_queue=self.media_data_queue,
         )
 
         # Start media download workers
         self.worker_manager.add_worker(
             queue=self.media_data_queue,
-            process_func=self._download_media,
+            process_func=self.scheduler.run,
             num_threads=20,
+            min_threads=4,
+            max_threads=60,
             pbar=self._regist_pbar("Download media"),
             running_event=self._running,
-            next_queue=self.media_desc_queue,
         )
 
         # Start media description workers
         self.worker_manager.add_worker(
             queue=self.media_desc_queue,
-            process_func=self._describe_media,
+            process_func=self.scheduler.run,
             num_threads=20,
+            min_threads=1,
+            max_threads=40,
+            capacity=LLMFactory.capacity,
             pbar=self._regist_pbar("Describe media"),
             running_event=self._running,
-            next_queue=self.translate_queue,
         )
 
         # Start translation workers
         self.worker_manager.add_worker(
             queue=self.translate_queue,
-            process_func=self._translate_content,
+            process_func=self.scheduler.run,
             num_threads=1,
+            min_threads=1,
+            max_threads=8,
+            capacity=LLMFactory.capacity,
             pbar=self._regist_pbar("Translate content"),
             running_event=self._running,
-            next_queue=self.keyword_queue,
+        )
+
+        # Start persist worker, every finished tweet is journaled immediately
+        self.worker_manager.add_worker(
+            queue=self.persist_queue,
+            process_func=self.scheduler.run,
+            num_threads=1,
+            pbar=self._regist_pbar("Save tweets"),
+            running_event=self._running,
         )
 
         # Start keywords workers
@@ -207,6 +495,27 @@ class TwitterScraper(BaseScraper[Dict, TwitterCellParser]):
         # Start all workers
         self.worker_manager.start_all()
 
+    def _reply_capacity(self) -> Optional[int]:
+        """Cookies of the pool that can take a request now, None without a pool."""
+        keys = shared_accounts(self.twitter_api.settings).ranked()
+        return self.twitter_api.key_manager.capacity(keys) if keys else None
+
+    def _staged(self, process_func: Callable, stage: Stage) -> Callable:
+        """Wrap a stage so its completion is recorded in the index."""
+        if inspect.iscoroutinefunction(process_func):
+
+            async def staged(task: Dict):
+                await process_func(task)
+                self.index.mark(task.get("rest_id"), stage)
+
+        else:
+
+            def staged(task: Dict):
+                process_func(task)
+                self.index.mark(task.get("rest_id"), stage)
+
+        return staged
+
     def _add_keywords(self, task: Dict):
         if task.get("keywords"):
             return
@@ -233,79 +542,89 @@ class TwitterScraper(BaseScraper[Dict, TwitterCellParser]):
     def _add_reply(self, task: Dict):
         if "replies" in task:
             return
-        api = TwitterAPI(use_pool=True)
+        api = shared_pooled_api()
         task["replies"] = api._get_reply(task["rest_id"]).unwrap()
         rm_mention(task)
 
-    def _download_media(self, task: Dict):
-        """Download media associated with a tweet."""
+    def _media_folders(self):
         save_folder = self.save_path / self.data_folder / "media"
-        thumb_folder = save_folder / "thumb"
-        avatar_folder = save_folder / "avatar"
+        return save_folder, save_folder / "thumb", save_folder / "avatar"
 
-        def download_avatar(author_info):
-            """Download avatar for the author."""
+    def _download(self, url: str, folder, errors: List[Exception]) -> Optional[str]:
+        """Download through the same proxies and connections as the API calls.
+
+        A failure is appended to ``errors`` and leaves the path unset, so the
+        retried node fetches only what is still missing.
+        """
+        try:
+            return download(
+                url,
+                folder,
+                proxies=self.twitter_api.proxy_manager,
+                http_pool=self.twitter_api.http_pool,
+            )
+        except Exception as e:
+            errors.append(e)
+            return None
+
+    def _download_avatars(self, task: Dict):
+        """Download avatars of the tweet author and the quoted author."""
+        _, _, avatar_folder = self._media_folders()
+        errors = []
+        for owner in media_owners(task):
+            author_info = owner.get("author")
             if not get(author_info, "avatar.path"):
-                author_info["avatar"]["path"] = download(
-                    get(author_info, "avatar.url"), avatar_folder
+                author_info["avatar"]["path"] = self._download(
+                    get(author_info, "avatar.url"), avatar_folder, errors
                 )
+        raise_first(errors)
 
-        def download_media_items(medias, save_folder, thumb_folder):
-            """Download media items and their thumbnails."""
-            for media in medias:
+    def _download_media(self, task: Dict):
+        """Download media items (and thumbnails) of a tweet and its quote."""
+        save_folder, thumb_folder, _ = self._media_folders()
+        errors = []
+        for owner in media_owners(task):
+            for media in owner.get("media") or []:
                 if not media.get("path"):
-                    media["path"] = download(media.get("url"), save_folder)
+                    media["path"] = self._download(
+                        media.get("url"), save_folder, errors
+                    )
                 if (
                     media.get("thumb")
                     and not media.get("thumb_path")
                     and media.get("path") != "media unavailable"
                 ):
-                    media["thumb_path"] = download(media.get("thumb"), thumb_folder)
-
-        def download_tweet_media(task: Dict[str, Union[Dict, List[Dict]]]):
-            # Download avatar for the main author
-            author_info = task.get("author")
-            download_avatar(author_info)
-
-            # Download main media items
-            if medias := task.get("media"):
-                download_media_items(medias, save_folder, thumb_folder)
-
-            # Handle quoted tweet
-            if (quote := task.get("quote")) and quote.get(
-                "rest_id"
-            ) != "tweet_unavailable":
-                quote_author_info = quote.get("author")
-                download_avatar(quote_author_info)
-
-                if quote_medias := quote.get("media"):
-                    download_media_items(quote_medias, save_folder, thumb_folder)
-
-        download_tweet_media(task)
-        if replies := task.get("replies"):
-            for reply in replies:
-                if conversation := reply.get("conversation"):
-                    [download_tweet_media(item) for item in conversation]
+                    media["thumb_path"] = self._download(
+                        media.get("thumb"), thumb_folder, errors
+                    )
+        raise_first(errors)
+
+    def _download_reply_media(self, task: Dict):
+        """Download avatars and media of every tweet in the replies."""
+        errors = []
+        for item in conversation_items(task):
+            for download_func in (self._download_avatars, self._download_media):
+                try:
+                    download_func(item)
+                except Exception as e:
+                    errors.append(e)
+        raise_first(errors)
 
     def _describe_media(self, task: Dict):
         """Describe media associated with a tweet."""
 
         def process_medias(medias: List[Dict]):
             for media in medias:
-                if not media.get("description") and (
-                    media.get("duration_millis") <= 5 * 60 * 1000
-                    if media.get("type") == "video"
-                    else True
-                ):
-                    if (path := media.get("path")) != "media unavailable":
-                        if path in self.media_desc_cache:
-                            media["description"] = self.media_desc_cache[path]
+                if needs_description(media):
+                    path = media.get("path")
+                    if path in self.media_desc_cache:
+                        media["description"] = self.media_desc_cache[path]
+                    else:
+                        processor = MediaProcessor()
+                        if res := processor.describe(path):
+                            media["description"] = res.unwrap()
                         else:
-                            processor = MediaProcessor()
-                            if res := processor.describe(path):
-                                media["description"] = res.unwrap()
-                            else:
-                                media["description"] = "failed/gemini"
+                            media["description"] = "failed/gemini"
 
         # 处理主任务的媒体
         if medias := task.get("media"):
@@ -316,36 +635,32 @@ class TwitterScraper(BaseScraper[Dict, TwitterCellParser]):
             if medias := quote.get("media"):
                 process_medias(medias)
 
-    def _translate_content(self, task: Dict):
-        """Translate the content of a tweet."""
-
-        def translate_text(text: str, context: str, lang: str):
-            translator = Translator(source_lang=lang)
-            return translator.translate(text, context).value_or(None)
-
-        def handle_tweet(tweet: Dict, extra_context: str = ""):
-            """
-            处理单条推文的内容和引用内容（quote），
-            如果还没有translation字段，则进行翻译并赋值。
-            """
-            for prefix in ("content", "quote.content"):
-                text = get(tweet, f"{prefix}.text") or ""
-                if text and not get(tweet, f"{prefix}.translation"):
-                    # 对应 media 或 quote.media
-                    media_key = prefix.replace("content", "media")
-                    media_desc = str(
-                        [
-                            get(m, "description") or ""
-                            for m in get(tweet, media_key) or []
-                        ]
-                        or ""
-                    )
-                    lang = get(tweet, f"{prefix}.lang")
+    @staticmethod
+    def _translate_tweet(tweet: Dict, extra_context: str = ""):
+        """
+        处理单条推文的内容和引用内容（quote），
+        如果还没有translation字段，则进行翻译并赋值。
+        """
+        for prefix in ("content", "quote.content"):
+            text = get(tweet, f"{prefix}.text") or ""
+            if text and not get(tweet, f"{prefix}.translation"):
+                # 对应 media 或 quote.media
+                media_key = prefix.replace("content", "media")
+                media_desc = str(
+                    [get(m, "description") or "" for m in get(tweet, media_key) or []]
+                    or ""
+                )
+                lang = get(tweet, f"{prefix}.lang")
 
-                    translation = translate_text(text, media_desc + extra_context, lang)
-                    get(tweet, prefix)["translation"] = translation
+                translator = Translator(source_lang=lang)
+                translation = translator.translate(
+                    text, media_desc + extra_context
+                ).value_or(None)
+                get(tweet, prefix)["translation"] = translation
 
-        # 构建主推文及其引用的上下文
+    @staticmethod
+    def _main_context(task: Dict) -> str:
+        """构建主推文及其引用的上下文"""
         main_text = get(task, "content.text") or ""
         quote_text = get(task, "quote.content.text") or ""
         main_media = str(
@@ -354,30 +669,418 @@ class TwitterScraper(BaseScraper[Dict, TwitterCellParser]):
         quote_media = str(
             [get(m, "description") or "" for m in get(task, "quote.media") or []] or ""
         )
-        main_context = (
+        return (
             f"<main_tweet>{main_text}{main_media}{quote_text}{quote_media}</main_tweet>"
         )
 
-        # 先翻译主推文
-        handle_tweet(task)
-
-        # 如果有评论（replies），遍历其中的对话
-        if replies := get(task, "replies"):
-            for reply in replies:
-                if conversation := get(reply, "conversation"):
-                    for i, item in enumerate(conversation):
-                        # 取该条推文（item）之前的所有对话内容，作为历史上下文
-                        history_texts = [
-                            get(c, "content.text") or "" for c in conversation[:i]
-                        ] or []
-                        history_context = f"<conversation_history>{history_texts}</conversation_history>"
-                        handle_tweet(item, main_context + history_context)
-
-    def scrape(self, url: str) -> List[Dict]:
+    def _translate_content(self, task: Dict):
+        """Translate the content of a tweet (and its quote)."""
+        self._translate_tweet(task)
+
+    def _translate_replies(self, task: Dict):
+        """Translate the replies, with the main tweet and history as context."""
+        main_context = self._main_context(task)
+        # 遍历评论（replies）中的对话
+        for reply in get(task, "replies") or []:
+            if conversation := get(reply, "conversation"):
+                for i, item in enumerate(conversation):
+                    # 取该条推文（item）之前的所有对话内容，作为历史上下文
+                    history_texts = [
+                        get(c, "content.text") or "" for c in conversation[:i]
+                    ] or []
+                    history_context = (
+                        f"<conversation_history>{history_texts}</conversation_history>"
+                    )
+                    self._translate_tweet(item, main_context + history_context)
+
+    def _persist_tweet(self, task: Dict):
+        self.store.append(task)
+
+    def _tweet_nodes(self, task: Dict, asynchronous: bool = False) -> List[Node]:
+        """Subtasks of one tweet and what each of them actually waits for.
+
+        Replies and media are fetched in parallel; only translation waits for
+        the media descriptions it uses as context. A tweet without media skips
+        the media and describe nodes altogether. Saving always runs, so a tweet
+        is kept even when one of its subtasks failed.
+        """
+        funcs = {
+            "replies": (self._add_reply, self._aadd_reply),
+            "avatars": (self._download_avatars, self._adownload_avatars),
+            "media": (self._download_media, self._adownload_media),
+            "reply_media": (self._download_reply_media, self._adownload_reply_media),
+            "describe": (self._describe_media, self._adescribe_media),
+            "translate": (self._translate_content, self._atranslate_content),
+            "translate_replies": (self._translate_replies, self._atranslate_replies),
+            "persist": (self._persist_tweet, self._apersist_tweet),
+        }
+
+        def node(name, kind, stage, deps=(), always=False):
+            func = funcs[name][asynchronous]
+            if stage is not None:
+                func = self._staged(func, stage)
+            # 下载失败多是 CDN 抖动，重试代价小，给更多次机会
+            attempts = self.download_attempts if kind == "download" else None
+            return Node(name, kind, func, deps, always, attempts)
+
+        nodes = [
+            node("replies", "reply", Stage.REPLIES),
+            node("avatars", "download", None),
+            node("reply_media", "download", Stage.REPLY_MEDIA, ("replies",)),
+            node("translate", "translate", Stage.TRANSLATED, ("describe",)),
+            node(
+                "translate_replies",
+                "translate",
+                Stage.REPLIES_TRANSLATED,
+                ("replies", "describe"),
+            ),
+        ]
+        if any(owner.get("media") for owner in media_owners(task)):
+            nodes += [
+                node("media", "download", Stage.MEDIA),
+                node("describe", "describe", Stage.DESCRIBED, ("media",)),
+            ]
+        nodes.append(
+            node(
+                "persist",
+                "persist",
+                Stage.SAVED,
+                tuple(n.name for n in nodes),
+                always=True,
+            )
+        )
+        return nodes
+
+    def _plan(self, task: Dict, nodes: List[Node]) -> Optional[Set[str]]:
+        """Nodes of a saved record that can be skipped, or None if it is complete.
+
+        Each record is inspected once here rather than walked through every
+        stage, so an unchanged archive costs no queue traffic at all.
+        """
+        skip = completed_nodes(task, self.index.stages(task.get("rest_id")))
+        if all(node.name in skip for node in nodes if node.name != "persist"):
+            return None
+        return skip
+
+    async def _aadd_reply(self, task: Dict):
+        if "replies" in task:
+            return
+        task["replies"] = (await self.async_api._get_reply(task["rest_id"])).unwrap()
+        rm_mention(task)
+
+    async def _adownload_avatars(self, task: Dict):
+        _, _, avatar_folder = self._media_folders()
+
+        async def download_avatar(author_info):
+            if not get(author_info, "avatar.path"):
+                author_info["avatar"]["path"] = await adownload(
+                    get(author_info, "avatar.url"), avatar_folder, self.async_client
+                )
+
+        results = await asyncio.gather(
+            *[download_avatar(o.get("author")) for o in media_owners(task)],
+            return_exceptions=True,
+        )
+        raise_first(results)
+
+    async def _adownload_media(self, task: Dict):
+        """Download all media items of a tweet and its quote concurrently."""
+        save_folder, thumb_folder, _ = self._media_folders()
+
+        async def download_media_item(media):
+            if not media.get("path"):
+                media["path"] = await adownload(
+                    media.get("url"), save_folder, self.async_client
+                )
+            if (
+                media.get("thumb")
+                and not media.get("thumb_path")
+                and media.get("path") != "media unavailable"
+            ):
+                media["thumb_path"] = await adownload(
+                    media.get("thumb"), thumb_folder, self.async_client
+                )
+
+        results = await asyncio.gather(
+            *[
+                download_media_item(media)
+                for owner in media_owners(task)
+                for media in owner.get("media") or []
+            ],
+            return_exceptions=True,
+        )
+        raise_first(results)
+
+    async def _adownload_reply_media(self, task: Dict):
+        jobs = []
+        for item in conversation_items(task):
+            jobs += [self._adownload_avatars(item), self._adownload_media(item)]
+        raise_first(await asyncio.gather(*jobs, return_exceptions=True))
+
+    async def _in_stage_thread(self, kind: str, func: Callable[[Dict], None], task):
+        """Run a blocking stage on the thread pool of its kind.
+
+        Each pool is as large as the stage's concurrency limit, so long LLM
+        calls neither queue behind each other in the loop's small default
+        executor nor hold up other stages.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._stage_executors[kind], func, task)
+
+    async def _adescribe_media(self, task: Dict):
+        # LLM clients are synchronous, keep them off the event loop
+        await self._in_stage_thread("describe", self._describe_media, task)
+
+    async def _atranslate_content(self, task: Dict):
+        await self._in_stage_thread("translate", self._translate_content, task)
+
+    async def _atranslate_replies(self, task: Dict):
+        await self._in_stage_thread("translate", self._translate_replies, task)
+
+    async def _apersist_tweet(self, task: Dict):
+        # append may trigger a compaction, which is slow disk IO
+        await self._in_stage_thread("persist", self._persist_tweet, task)
+
+    def _new_like_pages(self, running: threading.Event) -> Iterator[List[Dict]]:
+        """Page through the likes timeline, yielding the unsaved tweets of each page.
+
+        Paging stops at the watermark left by the last completed crawl. The new
+        watermark is only committed by ``_complete_crawl`` once every tweet of
+        this crawl has left the pipeline, so an interrupted or killed run never
+        skips a gap.
+
+        After every page a resume cursor is checkpointed. It points at the
+        oldest page whose tweets are not all saved yet, so an interrupted
+        crawl continues from there instead of the top of the timeline.
+
+        The next pages are fetched in the background while the current one is
+        being enqueued, but never past the watermark.
+        """
+        state = self.crawl_state
+        resuming = state.resuming
+        newest = state.pending_watermark
+        # (用于请求该页的游标, 该页需要保存的推文 id)
+        unsettled: Deque[Tuple[str, List[str]]] = deque()
+        match_count = 0
+        finished = False
+
+        def next_cursor(data: Dict) -> Optional[str]:
+            sort_indexes = get(data, "sort_indexes") or []
+            if not get(data, "tweets") or any(
+                map(state.is_below_watermark, sort_indexes)
+            ):
+                return None
+            return get(data, "cursor_bottom")
+
+        prefetcher = Prefetcher(
+            fetch=lambda cursor: self.twitter_api._likes_chunk(cursor).unwrap(),
+            next_cursor=next_cursor,
+            start=state.cursor or "",
+            depth=self.prefetch_pages,
+        )
+        try:
+            for page_cursor, data in prefetcher:
+                if not running.is_set():
+                    break
+                # 旧归档还没有水位线时，沿用遇到足够多已保存推文就停止的策略
+                if state.watermark is None and not resuming and match_count > 10:
+                    finished = True
+                    break
+                bottom_cursor = get(data, "cursor_bottom")
+                if not get(data, "tweets"):
+                    finished = True
+                    break
+                sort_indexes = get(data, "sort_indexes")
+                newest = newest or next(filter(None, sort_indexes), None)
+
+                entries = []
+                for entry, sort_index in zip(get(data, "tweets"), sort_indexes):
+                    if state.is_below_watermark(sort_index):
+                        finished = True
+                        break
+                    if self.index.is_saved(entry.get("rest_id")):
+                        match_count += 1
+                        continue
+                    if entry.get("rest_id") in self.resumed_ids:
+                        continue
+                    entries.append(entry)
+                yield entries
+                if finished:
+                    break
+
+                unsettled.append(
+                    (
+                        page_cursor,
+                        [
+                            e["rest_id"]
+                            for e in entries
+                            if (e.get("rest_id") or "").isdigit()
+                        ],
+                    )
+                )
+                while unsettled and all(map(self.index.is_saved, unsettled[0][1])):
+                    unsettled.popleft()
+                state.checkpoint(
+                    unsettled[0][0] if unsettled else bottom_cursor, newest
+                )
+            else:
+                # 游标耗尽时时间线已读完
+                finished = running.is_set()
+        finally:
+            prefetcher.close()
+
+        if finished:
+            # 推文可能还在各阶段队列中，等流水线排空后再提交水位线
+            self.crawl_finished = True
+            self.crawl_newest = newest
+
+    def _complete_crawl(self):
+        """Commit the finished crawl's watermark and drop its resume cursor."""
+        if self.crawl_finished:
+            self.crawl_state.complete(self.crawl_newest)
+
+    def _saved_jobs(
+        self, saved_data: List[Dict], asynchronous: bool = False
+    ) -> Iterator[Tuple[Dict, List[Node], Set[str]]]:
+        """Saved records that still have work, with the nodes they can skip.
+
+        When replaying dead letters only the records that failed are planned.
+        """
+        for data in saved_data:
+            if self.replay_ids is not None and data["rest_id"] not in self.replay_ids:
+                continue
+            if data["rest_id"] in self.resumed_ids:
+                continue
+            nodes = self._tweet_nodes(data, asynchronous)
+            if (skip := self._plan(data, nodes)) is not None:
+                yield data, nodes, skip
+
+    def _like_pages(self, running: threading.Event) -> Iterator[List[Dict]]:
+        if self.replay_ids is not None:
+            return iter(())
+        return self._new_like_pages(running)
+
+    def _resume_jobs(self, saved_data: List[Dict]) -> List[Tuple[Dict, Set[str]]]:
+        """Unfinished tweets checkpointed by an interrupted run.
+
+        A checkpointed task carries the results gathered so far, so it takes
+        the place of its saved record; tweets that were never saved join
+        ``self.tweets`` like newly crawled ones.
+        """
+        resumed = self.inflight.load()
+        if not resumed:
+            return []
+        print(f"resuming {len(resumed)} unfinished tweets")
+        fresh = {task["rest_id"]: task for task, _ in resumed}
+        self.resumed_ids = set(fresh)
+        for i, data in enumerate(saved_data):
+            if data["rest_id"] in fresh:
+                saved_data[i] = fresh.pop(data["rest_id"])
+        self.tweets.extend(fresh.values())
+        return resumed
+
+    def _drain_and_checkpoint(self):
+        """Stop intake, let running subtasks finish, then checkpoint every
+        unfinished tweet with the nodes it already completed."""
+        self._running.clear()
+        print("\nInterrupted, finishing running tasks (Ctrl-C again to skip)...")
+        if self.engine == "async":
+            jobs = list(self._async_jobs)
+        else:
+            try:
+                self.worker_manager.join_all(self.drain_timeout)
+            except KeyboardInterrupt:
+                pass
+            jobs = self.scheduler.active()
+        self.inflight.save(jobs)
+        print(f"Checkpointed {len(jobs)} unfinished tweets, next run resumes them")
+
+    async def _scrape_async(
+        self,
+        saved_data: List[Dict],
+        resumed: List[Tuple[Dict, Set[str]]],
+        pbar: tqdm,
+    ):
+        """Run the same tweet graph as the thread engine on a single event loop."""
+        self.async_api = AsyncTwitterAPI(use_pool=True)
+        self.async_client = httpx.AsyncClient(timeout=30)
+
+        limits = {
+            kind: asyncio.Semaphore(limit) for kind, limit in ASYNC_STAGE_LIMITS.items()
+        }
+        self._stage_executors = {
+            kind: ThreadPoolExecutor(
+                ASYNC_STAGE_LIMITS[kind], thread_name_prefix=f"async-{kind}"
+            )
+            for kind in ASYNC_THREAD_STAGES
+        }
+        # 翻页单独占一个线程，不排在长时间的 LLM 调用后面
+        paging = ThreadPoolExecutor(1, thread_name_prefix="likes-pages")
+        loop = asyncio.get_running_loop()
+        pbars = {
+            "reply": self._regist_pbar("Get full reply"),
+            "download": self._regist_pbar("Download media"),
+            "describe": self._regist_pbar("Describe media"),
+            "translate": self._regist_pbar("Translate content"),
+            "persist": self._regist_pbar("Save tweets"),
+        }
+
+        async def process(job: Job):
+            await arun_graph(
+                job,
+                limits,
+                pbars,
+                max_attempts=self.max_attempts,
+                dead_letters=self.dead_letters,
+            )
+            # 被取消（中断）的任务留在 _async_jobs 中，写入检查点
+            self._async_jobs.discard(job)
+
+        async def submit(task: Dict, nodes: List[Node], skip: Set[str]):
+            job = Job(task, nodes, skip)
+            self._async_jobs.add(job)
+            await queue.put(job)
+
+        queue = asyncio.Queue(maxsize=self.queue_capacity.get("reply", 0))
+        worker_func = create_async_queue_worker(queue=queue, process_func=process)
+        workers = [
+            asyncio.create_task(worker_func()) for _ in range(ASYNC_TWEET_WORKERS)
+        ]
+
+        try:
+            for task, done in resumed:
+                await submit(task, self._tweet_nodes(task, asynchronous=True), done)
+            pages = self._like_pages(self._running)
+            while True:
+                entries = await loop.run_in_executor(paging, next, pages, None)
+                if entries is None:
+                    break
+                for entry in entries:
+                    pbar.update(1)
+                    nodes = self._tweet_nodes(entry, asynchronous=True)
+                    await submit(entry, nodes, set())
+                    self.tweets.append(entry)
+            pbar.update(len(saved_data))
+            for job in self._saved_jobs(saved_data, asynchronous=True):
+                await submit(*job)
+            await queue.join()
+            self._complete_crawl()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            for executor in [paging, *self._stage_executors.values()]:
+                executor.shutdown(wait=False, cancel_futures=True)
+            await self.async_api.aclose()
+            await self.async_client.aclose()
+
+    def scrape(self, url: str, replay_dlq: bool = False) -> List[Dict]:
         """Scrape tweets from the given URL.
 
         Args:
             url: Twitter timeline URL to scrape
+            replay_dlq: Skip the timeline and only retry the tweets recorded
+                in the dead-letter store
 
         Returns:
             List of dictionaries containing tweet data
@@ -386,41 +1089,58 @@ class TwitterScraper(BaseScraper[Dict, TwitterCellParser]):
         parsed_url = urlsplit(url)
         self.data_folder = (parsed_url.netloc + parsed_url.path).replace("/", ".")
         (self.save_path / self.data_folder).mkdir(exist_ok=True)
-        saved_data = self._saved_data(self.data_folder)
-        saved_ids = [d["rest_id"] for d in saved_data]
-        next_queue = self.conversation_queue
+        self.store = TweetStore(self.save_path / self.data_folder)
+        saved_data = self.store.records()
+        self._open_index(saved_data)
+        self.crawl_state = CrawlState(
+            self.save_path / self.data_folder / "crawl_state.json"
+        )
+        if not saved_data:
+            self.crawl_state.reset()
+        self.dead_letters = DeadLetterStore(
+            self.save_path / self.data_folder / "dead_letters.jsonl"
+        )
+        self.scheduler.dead_letters = self.dead_letters
+        if replay_dlq:
+            self.replay_ids = {e["rest_id"] for e in self.dead_letters.take()}
+            print(f"replaying {len(self.replay_ids)} dead-lettered tweets")
+        self.inflight = JobCheckpoint(
+            self.save_path / self.data_folder / "inflight.jsonl"
+        )
+        resumed = self._resume_jobs(saved_data)
         pbar = self._regist_pbar("Get likes")
 
         try:
-            with WorkerContext() as ctx:
-                self._start_workers()
-
-                bottom_cursor = ""
-                match_count = 0
-                while ctx._running.is_set():
-                    if match_count > 10:
-                        break
-                    data = self.twitter_api._likes_chunk(bottom_cursor).unwrap()
-                    bottom_cursor = get(data, "cursor_bottom")
-                    if not get(data, "tweets"):
-                        break
-                    tweets_chunk = get(data, "tweets")
-                    for entry in tweets_chunk:
-                        if entry.get("rest_id") in saved_ids:
-                            match_count += 1
-                            continue
-                        pbar.update(1)
-                        next_queue.put(entry)
-                        self.tweets.append(entry)
-            for data in saved_data:
-                pbar.update(1)
-                next_queue.put(data)
-
+            if self.engine == "async":
+                asyncio.run(self._scrape_async(saved_data, resumed, pbar))
+            else:
+                with WorkerContext() as ctx:
+                    self._start_workers()
+                    for task, done in resumed:
+                        self.scheduler.submit(task, self._tweet_nodes(task), done)
+
+                    for entries in self._like_pages(ctx._running):
+                        for entry in entries:
+                            pbar.update(1)
+                            self.scheduler.submit(entry, self._tweet_nodes(entry))
+                            self.tweets.append(entry)
+                pbar.update(len(saved_data))
+                for job in self._saved_jobs(saved_data):
+                    self.scheduler.submit(*job)
+                # 子任务会不断派生新任务，必须等全部完成后再发送停止信号
+                if self.scheduler.join():
+                    self._complete_crawl()
+        except KeyboardInterrupt:
+            self._drain_and_checkpoint()
+            raise
         finally:
             if sys.exc_info()[0] is None:
                 self.close()
             else:
                 self.force_close()
+        self.inflight.clear()
+        if replay_dlq:
+            self.dead_letters.finish_replay()
         tweets: List[Dict] = self.tweets + saved_data
         # tweets.sort(
         #     key=lambda x: datetime.strptime(
@@ -437,28 +1157,30 @@ class TwitterScraper(BaseScraper[Dict, TwitterCellParser]):
             "results": [tweet for tweet in tweets if tweet.get("rest_id") != "ad"],
         }
         full_data = remove_none_values(full_data).unwrap()
-        self._save_data_block_interrupt(
-            self.data_folder,
-            full_data,
-        )
+        self._save_data_block_interrupt(full_data)
         # 生成HTML预览
         preview_path = self.save_path / self.data_folder / "gallery.html"
         generate_html(full_data, preview_path)
         return tweets
 
+    def _open_index(self, saved_data: List[Dict]):
+        """Open the rest_id index, rebuilding it when it is new or stale."""
+        self.index = TweetIndex(self.save_path / self.data_folder / "index.bin")
+        if not saved_data and len(self.index):
+            # 归档被删除后索引已经失效
+            self.index.reset()
+        if self.index.created:
+            self.index.mark_all((d["rest_id"] for d in saved_data), Stage.SAVED)
+        else:
+            # 上次中断时可能已写入 journal 但还没来得及标记
+            self.index.mark_all(self.store.journal_ids, Stage.SAVED)
+
     def _saved_data(self, folder: str) -> List[Dict]:
-        """Get previously saved tweet data"""
-        path: Path = self.save_path / folder / "scraped_data.json"
-        if not path.exists():
-            return []
-        with open(path, "r", encoding="utf-8") as f:
-            data: Dict = json.load(f)
-        return data.get("results", [])
+        """Get previously saved tweet data, including tweets journaled by an interrupted run"""
+        return TweetStore(self.save_path / folder).records()
 
-    def _save_data_block_interrupt(self, folder: str, data: dict):
+    def _save_data_block_interrupt(self, data: dict):
         """写入文件时先屏蔽KeyboardInterrupt，避免中途被打断写坏文件。"""
-        final_path = self.save_path / folder / "scraped_data.json"
-
         # 1. 记录原来的信号处理器
         original_handler = signal.getsignal(signal.SIGINT)
 
@@ -466,10 +1188,7 @@ class TwitterScraper(BaseScraper[Dict, TwitterCellParser]):
         signal.signal(signal.SIGINT, lambda signum, frame: None)
 
         try:
-            with open(final_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
-                f.flush()
-                # 根据需要可加上 fsync
+            self.store.write(data)
 
         finally:
             # 3. 恢复原来的处理器
@@ -479,6 +1198,11 @@ class TwitterScraper(BaseScraper[Dict, TwitterCellParser]):
         """Gracefully close the scraper, stopping all workers and closing browsers."""
         try:
             self.worker_manager.stop_all()
+            self.retry.stop()
+            self.twitter_api.http_pool.close()
+            shared_accounts(self.twitter_api.settings).save()
+            self.store and self.store.close()
+            self.index and self.index.close()
             [pbar.close() for pbar in self.pbars]
         except KeyboardInterrupt:
             self.force_close()
@@ -487,5 +1211,8 @@ class TwitterScraper(BaseScraper[Dict, TwitterCellParser]):
         """Forcefully close the scraper, stopping all workers immediately."""
         self._running.clear()
         self.worker_manager.force_stop_all()
+        self.retry.stop()
+        self.store and self.store.close()
+        self.index and self.index.close()
         # self.browser_manager.close_all_browsers()
         [pbar.close() for pbar in self.pbars]
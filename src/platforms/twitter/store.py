@@ -0,0 +1,235 @@
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from src.service.helper import remove_none_values
+from src.service.json_codec import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+
+class TweetStore:
+    """Append-only journal in front of ``scraped_data.json``.
+
+    Every finished tweet is appended to ``journal.jsonl`` right away, so a crash
+    only loses the tweets still inside the pipeline. ``compact`` folds the
+    journal back into ``scraped_data.json`` (same format as before) and
+    truncates it.
+
+    Each record is also kept as the JSON it was loaded or appended with, so
+    compaction writes what was persisted even while a re-run mutates the
+    record dicts. Compaction moves the journal aside to
+    ``journal.compacting.jsonl`` and takes those lines under the lock; the
+    data file is then written without holding it, one record per line, so
+    appends go on into a fresh journal meanwhile. The moved journal is
+    deleted once the new data file is in place, and loaded again if a crash
+    came first.
+    """
+
+    DATA_FILE = "scraped_data.json"
+    JOURNAL_FILE = "journal.jsonl"
+    COMPACTING_FILE = "journal.compacting.jsonl"
+
+    def __init__(self, folder: Path, compact_interval: float = 600):
+        self.folder = Path(folder)
+        self.data_path = self.folder / self.DATA_FILE
+        self.journal_path = self.folder / self.JOURNAL_FILE
+        self.compacting_path = self.folder / self.COMPACTING_FILE
+        self.compact_interval = compact_interval
+
+        self.metadata: Dict = {}
+        self._records: Dict[str, Dict] = {}
+        # 每条记录落盘时的 JSON，压缩时直接写出，不再遍历可能被修改的字典
+        self._lines: Dict[str, str] = {}
+        self._base_ids: List[str] = []
+        self.journal_ids: List[str] = []
+        self._lock = threading.RLock()
+        self._journal = None
+        self._last_compact = time.monotonic()
+        self._compacting = False
+        self._compactor: Optional[threading.Thread] = None
+
+        self._load()
+
+    def _load(self):
+        if self.data_path.exists():
+            with open(self.data_path, "rb") as f:
+                data: Dict = loads(f.read())
+            self.metadata = data.get("metadata", {})
+            for record in data.get("results", []):
+                self._records[record["rest_id"]] = record
+                self._lines[record["rest_id"]] = self._encode(record)
+            self._base_ids = list(self._records)
+
+        # 上次压缩没写完时，挪开的 journal 比当前 journal 更早
+        for path in (self.compacting_path, self.journal_path):
+            if not path.exists():
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = loads(line)
+                    except json.JSONDecodeError:
+                        # 崩溃时最后一行可能只写了一半
+                        logger.warning(f"Skip torn journal line in {path}")
+                        continue
+                    self._records[record["rest_id"]] = record
+                    self._lines[record["rest_id"]] = line.rstrip("\n")
+                    self.journal_ids.append(record["rest_id"])
+
+    @staticmethod
+    def _encode(record: Dict) -> str:
+        return dumps(remove_none_values(record).unwrap()).decode("utf-8")
+
+    def _ids(self) -> List[str]:
+        """Journaled-only (newer) ids first; called with the lock held."""
+        base = set(self._base_ids)
+        return [rid for rid in self._records if rid not in base] + self._base_ids
+
+    def records(self) -> List[Dict]:
+        """All known tweets, journaled-only (newer) ones first."""
+        with self._lock:
+            return [self._records[rid] for rid in self._ids()]
+
+    def _open_journal(self):
+        """Called with the lock held."""
+        self.folder.mkdir(parents=True, exist_ok=True)
+        torn = False
+        if self.journal_path.exists() and self.journal_path.stat().st_size:
+            with open(self.journal_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        if torn:
+            # 不要把新记录接在被截断的行后面
+            self._journal.write("\n")
+
+    def append(self, record: Dict):
+        """Persist one finished tweet to the journal."""
+        if record.get("rest_id") == "ad":
+            return
+        line = self._encode(record)
+        with self._lock:
+            if self._journal is None:
+                self._open_journal()
+            self._journal.write(line + "\n")
+            self._journal.flush()
+            self._records[record["rest_id"]] = record
+            self._lines[record["rest_id"]] = line
+            self.journal_ids.append(record["rest_id"])
+        if time.monotonic() - self._last_compact >= self.compact_interval:
+            self.compact(background=True)
+
+    def compact(self, metadata: Optional[Dict] = None, background: bool = False):
+        """Rewrite scraped_data.json from everything known so far.
+
+        With ``background`` the file is written on a separate thread. Does
+        nothing while another compaction is still running.
+        """
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+            self._last_compact = time.monotonic()
+            snapshot = self._rotate(metadata)
+        if background:
+            self._compactor = threading.Thread(target=self._fold, args=snapshot)
+            self._compactor.daemon = True
+            self._compactor.start()
+        else:
+            self._fold(*snapshot)
+
+    def _rotate(
+        self, metadata: Optional[Dict]
+    ) -> Tuple[Dict, List[str], List[str], int]:
+        """Move the journal aside and snapshot the records, with the lock held."""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if self.journal_path.exists():
+            if self.compacting_path.exists():
+                with open(self.journal_path, "r", encoding="utf-8") as src, open(
+                    self.compacting_path, "a", encoding="utf-8"
+                ) as dst:
+                    dst.write(src.read())
+                self.journal_path.unlink()
+            else:
+                os.replace(self.journal_path, self.compacting_path)
+        ids = [rid for rid in self._ids() if rid != "ad"]
+        metadata = remove_none_values(metadata or self.metadata).unwrap()
+        return metadata, ids, [self._lines[rid] for rid in ids], len(self.journal_ids)
+
+    def _fold(self, metadata: Dict, ids: List[str], lines: List[str], folded: int):
+        try:
+            self._write_lines(metadata, lines)
+            with self._lock:
+                self.compacting_path.unlink(missing_ok=True)
+                self.metadata = metadata
+                self._base_ids = ids
+                # 压缩期间追加的记录还只在新的 journal 里
+                self.journal_ids = self.journal_ids[folded:]
+        except Exception as e:
+            logger.error(f"Failed to compact {self.data_path}: {e}")
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def _write_lines(self, metadata: Dict, lines: List[str]):
+        """Write scraped_data.json with one already encoded record per line."""
+        tmp_path = self.data_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write('{\n    "metadata": ')
+            f.write(json.dumps(metadata, ensure_ascii=False))
+            f.write(',\n    "results": [')
+            for i, line in enumerate(lines):
+                f.write(",\n        " if i else "\n        ")
+                f.write(line)
+            f.write("\n    ]\n}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.data_path)
+
+    def _write_data(self, full_data: Dict):
+        tmp_path = self.data_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(full_data, f, ensure_ascii=False, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.data_path)
+
+    def wait(self):
+        """Block until a background compaction has finished."""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    def write(self, full_data: Dict):
+        """Atomically replace scraped_data.json and drop the folded journal."""
+        self.wait()
+        with self._lock:
+            self._write_data(full_data)
+
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            self.journal_path.unlink(missing_ok=True)
+            self.compacting_path.unlink(missing_ok=True)
+
+            self.metadata = full_data.get("metadata", {})
+            self._records = {r["rest_id"]: r for r in full_data.get("results", [])}
+            self._lines = {rid: self._encode(r) for rid, r in self._records.items()}
+            self._base_ids = list(self._records)
+            self.journal_ids = []
+            self._last_compact = time.monotonic()
+
+    def close(self):
+        """Let a running compaction finish and close the journal."""
+        self.wait()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
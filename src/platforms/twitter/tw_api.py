@@ -1,16 +1,19 @@
+import asyncio
 import base64
 import html
 import json
 import logging
 import os
 import random
-import shutil
 import sys
 import threading
 import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from functools import reduce
-from typing import Any, Dict, List, Optional, Union
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 from urllib.parse import urlparse
 
 import httpx
@@ -23,15 +26,23 @@ from returns.result import Failure, Result, Success
 from tenacity import (
     RetryCallState,
     retry,
+    retry_if_not_exception_type,
     stop_after_attempt,
     wait_exponential,
 )
 from tqdm import tqdm
 
 from src.service.base import KeyManager
+from src.service.circuit_breaker import CircuitBreaker, CircuitOpenError
 from src.service.helper import get
+from src.service.http_pool import ClientPool
+from src.service.json_codec import loads
+from src.service.proxy_manager import ProxyManager
 
 from ..utils import get_cookie_value, read_netscape_cookies
+from .accounts import AccountScheduler
+from .guest_tokens import GuestTokenPool
+from .response_cache import ResponseCache
 
 # 禁用 httpx 的日志输出
 logging.getLogger("httpx").setLevel(logging.CRITICAL)
@@ -52,14 +63,28 @@ def print_error_stack(retry_state: RetryCallState):
         traceback.print_exception(type(exc), exc, exc.__traceback__)
 
 
-def reset_guest_token(retry_state: RetryCallState):
-    """在重试前重置 guest_token"""
-    instance: TwitterAPI = retry_state.args[0]  # 获取类实例 (self)
-    instance._guest_token = None
-
-
 class XSettings(BaseSettings):
     xpool: Optional[List[str]] = Field(default=[], validate_default=True)
+    # 未设置时，安装了 h2 就启用 HTTP/2
+    http2: Optional[bool] = None
+    http_max_connections: int = 100
+    http_max_keepalive: int = 20
+    http_idle_timeout: float = 300
+    # TweetDetail 响应缓存的有效期（秒），0 关闭，负数永不过期
+    detail_cache_ttl: float = 7 * 24 * 3600
+    detail_cache_dir: str = "cache/tweet_detail"
+    # guest token 池：保持的 token 数、有效期（秒）和每个 token 的请求上限
+    guest_pool_size: int = 3
+    guest_token_ttl: float = 3 * 3600
+    guest_token_max_uses: int = 500
+    # 替换所有 API 地址的协议和主机，例如指向本地回放服务 http://127.0.0.1:8787
+    api_base_url: Optional[str] = None
+    # XPOOL 账号的健康状态，被锁账号的隔离记录跨运行保留
+    account_state_path: str = "config/account_state.json"
+    # 异步引擎中一页回复同时展开的 ShowMore 数，限速仍由 KeyManager 控制
+    showmore_concurrency: int = 4
+    # 同步引擎所有回复线程共用的 ShowMore 展开线程数，不超过 http_max_connections
+    showmore_workers: int = 16
     model_config = ConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -76,6 +101,88 @@ class XSettings(BaseSettings):
         return v
 
 
+_http_pool: Optional[ClientPool] = None
+_http_pool_lock = threading.Lock()
+_key_manager = KeyManager(rpm=15, cooldown_time=660)
+# Likes 的配额与 TweetDetail 分开计算，有响应头后按服务端剩余额度限速
+_likes_key_manager = KeyManager(rpm=30, cooldown_time=660)
+_pooled_api: Optional["TwitterAPI"] = None
+_pooled_api_lock = threading.Lock()
+_showmore_executor: Optional[ThreadPoolExecutor] = None
+_showmore_executor_lock = threading.Lock()
+_accounts: Optional[AccountScheduler] = None
+_accounts_lock = threading.Lock()
+_guest_pools: Dict[Optional[str], GuestTokenPool] = {}
+_guest_pools_lock = threading.Lock()
+# 按接口熔断，连续失败时快速失败而不是排队重试
+_breakers: Dict[str, CircuitBreaker] = {
+    name: CircuitBreaker(name) for name in ("TweetDetail", "GuestTweetDetail", "Likes")
+}
+
+
+def shared_http_pool(settings: XSettings) -> ClientPool:
+    """The process-wide client pool, so every TwitterAPI reuses connections."""
+    global _http_pool
+    with _http_pool_lock:
+        if _http_pool is None:
+            _http_pool = ClientPool(
+                http2=settings.http2,
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive,
+                idle_timeout=settings.http_idle_timeout,
+            )
+        return _http_pool
+
+
+def shared_showmore_executor(settings: XSettings) -> ThreadPoolExecutor:
+    """The process-wide executor expanding ShowMore cursors for every reply worker."""
+    global _showmore_executor
+    with _showmore_executor_lock:
+        if _showmore_executor is None:
+            workers = min(settings.showmore_workers, settings.http_max_connections)
+            _showmore_executor = ThreadPoolExecutor(
+                max(workers, 1), thread_name_prefix="showmore"
+            )
+        return _showmore_executor
+
+
+def shared_accounts(settings: XSettings) -> AccountScheduler:
+    """The process-wide health tracker of the XPOOL accounts."""
+    global _accounts
+    with _accounts_lock:
+        if _accounts is None:
+            _accounts = AccountScheduler(
+                settings.xpool, Path(settings.account_state_path)
+            )
+        return _accounts
+
+
+def shared_guest_tokens(api: "TwitterAPI") -> GuestTokenPool:
+    """The process-wide guest token pool for the token source of ``api``."""
+    with _guest_pools_lock:
+        if api.endpoint not in _guest_pools:
+            _guest_pools[api.endpoint] = GuestTokenPool(
+                api._fetch_guest_token,
+                size=api.settings.guest_pool_size,
+                ttl=api.settings.guest_token_ttl,
+                max_uses=api.settings.guest_token_max_uses,
+            )
+        return _guest_pools[api.endpoint]
+
+
+def shared_pooled_api() -> "TwitterAPI":
+    """The process-wide cookie-pool client, created on first use.
+
+    It is safe to share between worker threads: the picked cookie never
+    leaves the request, and throttling goes through the shared KeyManager.
+    """
+    global _pooled_api
+    with _pooled_api_lock:
+        if _pooled_api is None:
+            _pooled_api = TwitterAPI(use_pool=True)
+        return _pooled_api
+
+
 class TwitterAPI:
     def __init__(
         self,
@@ -83,42 +190,71 @@ class TwitterAPI:
         endpoint: str = None,
         cookie_path: str = "config/cookies.txt",
         use_pool: bool = False,
+        http_pool: Optional[ClientPool] = None,
     ):
         self.settings = XSettings()
-        self.key_manager = KeyManager(rpm=15, cooldown_time=660)
+        self.http_pool = http_pool or shared_http_pool(self.settings)
+        # 所有实例共用一个 KeyManager，cookie 的限速在整个进程内才准确
+        self.key_manager = _key_manager
+        self.likes_key_manager = _likes_key_manager
+        self.detail_cache = None
+        if self.settings.detail_cache_ttl:
+            self.detail_cache = ResponseCache(
+                self.settings.detail_cache_dir, self.settings.detail_cache_ttl
+            )
         self.proxies = proxies
-        self.guest_token_url = "https://api.twitter.com/1.1/guest/activate.json"
-        self.guest_tweet_detail_url = (
+        self.proxy_manager = ProxyManager(proxies)
+        self.breakers = _breakers
+        self.guest_token_url = self._api_url(
+            "https://api.twitter.com/1.1/guest/activate.json"
+        )
+        self.guest_tweet_detail_url = self._api_url(
             "https://x.com/i/api/graphql/0hWvDhmW8YQ-S_ib3azIrw/TweetResultByRestId"
         )
 
-        self.auth_tweet_detail_url = (
+        self.auth_tweet_detail_url = self._api_url(
             "https://x.com/i/api/graphql/B9_KmbkLhXt6jRwGjJrweg/TweetDetail"
         )
-        self.auth_likes_url = "https://x.com/i/api/graphql/kgZtsNyE46T3JaEf2nF9vw/Likes"
-        self.auth_user_info_url = (
+        self.auth_likes_url = self._api_url(
+            "https://x.com/i/api/graphql/kgZtsNyE46T3JaEf2nF9vw/Likes"
+        )
+        self.auth_user_info_url = self._api_url(
             "https://x.com/i/api/graphql/i_0UQ54YrCyqLUvgGzXygA/UserByRestId"
         )
-        self._guest_token = None
         self._last_proxies = []
-        self.failed_cookies = []
         self._last_proxies_lock = threading.Lock()
         self.endpoint = endpoint
+        self.guest_tokens = shared_guest_tokens(self)
         self.cookie = read_netscape_cookies(cookie_path)
         self.use_pool = use_pool
-        self.cookie_pool = self._read_cookie_pool()
+        self.accounts = shared_accounts(self.settings) if use_pool else None
 
         self.detail_call_count = 0
         self.max_call_count = self._random_limit()
 
         if self.use_pool:
-            self.cookie = next(self.cookie_pool)
+            # 点赞、用户信息等单账号请求用当前最健康的账号
+            ranked = self.accounts.ranked()
+            self.cookie = self._account_cookie(ranked[0]) if ranked else None
+
+    def _api_url(self, url: str) -> str:
+        """``url`` on ``API_BASE_URL`` when set, e.g. the local replay server."""
+        if not self.settings.api_base_url:
+            return url
+        return self.settings.api_base_url.rstrip("/") + urlparse(url).path
 
     def _random_limit(self):
         return random.randint(50, 150)
 
     def _choose_proxy(self):
-        return random.choice(self.proxies) or None
+        return self.proxy_manager.choose() or None
+
+    @contextmanager
+    def _proxied_client(self) -> Iterator[httpx.Client]:
+        """A pooled client through the best proxy, its outcome fed back."""
+        proxy = self._choose_proxy()
+        with self.proxy_manager.track(proxy), self.http_pool.client(proxy) as client:
+            yield client
 
     def parse_cookie_string(self, cookie_str) -> Maybe[Dict[str, Any]]:
         cookie_dict = {}
@@ -127,77 +263,94 @@ class TwitterAPI:
             pair = pair.strip()
             if "=" in pair:
                 key, value = pair.split("=", 1)
-                if value in self.failed_cookies:
-                    return Nothing
                 cookie_dict[key.strip()] = value.strip()
         return Some(cookie_dict)
 
-    def _read_cookie_pool(self):
-        if not self.use_pool:
-            return None
+    def _account_cookie(self, key: str) -> Dict[str, Any]:
+        """Cookies of an XPOOL entry (a base64 encoded cookie string)."""
+        decoded_data = base64.b64decode(key).decode("utf-8")
+        return self.parse_cookie_string(decoded_data).unwrap()
 
-        pool = []
-        for encoded_data in self.settings.xpool:
-            decoded_data = base64.b64decode(encoded_data).decode("utf-8")
-            self.parse_cookie_string(decoded_data).bind_optional(pool.append)
+    def _account_keys(self) -> List[str]:
+        """Keys for KeyManager: pooled accounts healthiest first, else the cookie."""
+        if self.use_pool:
+            return self.accounts.ranked()
+        return self.settings.xpool or [self.cookie]
 
-        return iter(pool)
+    def _rate_limit(
+        self,
+        key: Any,
+        response: httpx.Response,
+        key_manager: Optional[KeyManager] = None,
+    ) -> Optional[float]:
+        """Feed the rate limit headers of ``response`` into ``key_manager``
+        (the TweetDetail one by default).
+
+        Returns the reset timestamp, or None when the headers are missing.
+        """
+        remaining = response.headers.get("x-rate-limit-remaining")
+        reset = response.headers.get("x-rate-limit-reset")
+        if remaining is None or reset is None:
+            return None
+        key_manager = key_manager or self.key_manager
+        key_manager.update_rate_limit(key, int(remaining), float(reset))
+        return float(reset)
 
-    def _get_guest_token(self) -> str:
-        """Get a guest token either from custom endpoint or Twitter's API."""
-        if self._guest_token is not None:
-            return self._guest_token
+    def _record_account(
+        self,
+        key: str,
+        ok: bool,
+        started: float,
+        response: Optional[httpx.Response] = None,
+    ):
+        if self.accounts is None:
+            return
+        self.accounts.record(
+            key,
+            ok,
+            latency=time.monotonic() - started,
+            status_code=response.status_code if response is not None else None,
+            headers=response.headers if response is not None else None,
+        )
 
-        if self.endpoint:
-            self._guest_token = self._get_token_from_endpoint()
-        else:
-            self._guest_token = self._get_token_direct()
+    def _fetch_guest_token(self) -> str:
+        """Get a guest token either from custom endpoint or Twitter's API.
 
-        return self._guest_token
+        Makes a single attempt; ``GuestTokenPool`` retries with backoff.
+        """
+        if self.endpoint:
+            return self._get_token_from_endpoint()
+        return self._get_token_direct()
 
     def _get_token_from_endpoint(self) -> str:
-        """Get guest token from custom endpoint with infinite retries."""
-        while True:
-            try:
-                response = httpx.post(self.endpoint)
-                response.raise_for_status()
-                return response.json()["guest_token"]
-            except Exception:
-                time.sleep(60)
-
-    def _get_token_direct(self, max_retries: int = 3) -> str:
-        """Get guest token from Twitter API with limited retries."""
-        last_error = None
-        retries = max_retries
-
-        while retries > 0:
-            try:
-                with httpx.Client() as client:
-                    response = client.post(
-                        self.guest_token_url,
-                        headers={"authorization": f"Bearer {AUTH_TOKEN}"},
-                    )
-                    response.raise_for_status()
-                    return response.json()["guest_token"]
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 429:
-                    time.sleep(60)
-                    continue
-                last_error = e
-            except Exception as e:
-                last_error = e
-                time.sleep(3)
-            retries -= 1
-
-        raise last_error or Exception("Failed to get guest token from Twitter API")
+        """Get guest token from custom endpoint."""
+        with self.http_pool.client() as client:
+            response = client.post(self.endpoint)
+        response.raise_for_status()
+        return response.json()["guest_token"]
+
+    def _get_token_direct(self) -> str:
+        """Get guest token from Twitter API."""
+        with self.http_pool.client() as client:
+            response = client.post(
+                self.guest_token_url,
+                headers={"authorization": f"Bearer {AUTH_TOKEN}"},
+            )
+        response.raise_for_status()
+        return response.json()["guest_token"]
 
-    def _get_guest_headers(self) -> Dict[str, str]:
+    def _get_guest_headers(self, token: str) -> Dict[str, str]:
         """获取访客请求头"""
         return {
             "authorization": f"Bearer {AUTH_TOKEN}",
-            "x-guest-token": self._get_guest_token(),
+            "x-guest-token": token,
         }
 
+    def _reject_guest_token(self, token: str, status_code: int):
+        # token 失效或被限流时从池中移除，重试时换一个
+        if status_code in (401, 403, 429):
+            self.guest_tokens.invalidate(token)
+
     def _get_auth_headers(self, cookies: list) -> Dict[str, str]:
         """获取认证请求头"""
         return {
@@ -373,14 +526,14 @@ class TwitterAPI:
         params = self._get_user_info_params(
             get_cookie_value(self.cookie, "twid").replace("u%3D", "")
         )
-        with httpx.Client(proxy=self._choose_proxy()) as client:
+        with self._proxied_client() as client:
             response = client.get(
                 self.auth_user_info_url,
                 headers=headers,
                 params=params,
             )
             response.raise_for_status()
-            return Success(response.json())
+            return Success(loads(response.content))
 
     def _get_self_name(self) -> str:
         data = self._self_info().unwrap()
@@ -389,29 +542,41 @@ class TwitterAPI:
     @retry(
         stop=stop_after_attempt(10),
         wait=wait_exponential(max=60),
-        before=reset_guest_token,
+        retry=retry_if_not_exception_type(CircuitOpenError),
         retry_error_callback=print_error_stack,
     )
     def _likes(self, cursor: str = "") -> Result[Dict[str, Any], Exception]:
         headers = self._get_auth_headers(self.cookie)
         params = self._get_likes_auth_params(cursor)
-        with httpx.Client(proxy=self._choose_proxy()) as client:
-            response = client.get(
-                self.auth_likes_url,
-                headers=headers,
-                params=params,
-            )
-            response.raise_for_status()
-            return Success(response.json())
+        # Likes 有自己的配额，不占用 TweetDetail 的限速
+        limiter = self.likes_key_manager
+        with limiter.context([self.cookie]) as key:
+            with self._proxied_client() as client, self.breakers["Likes"].guard():
+                response = client.get(
+                    self.auth_likes_url,
+                    headers=headers,
+                    params=params,
+                )
+                reset_at = self._rate_limit(key, response, limiter)
+                if response.status_code == 429:
+                    limiter.mark_key_cooldown(key, until=reset_at)
+                response.raise_for_status()
+                return Success(loads(response.content))
 
     def _likes_chunk(self, cursor: str = "") -> Result[Dict[str, Any], Exception]:
-        data = self._likes(cursor).unwrap()
+        return Success(self._parse_likes(self._likes(cursor).unwrap()))
+
+    def _parse_likes(self, data: Dict[str, Any]) -> Dict[str, Any]:
         entries = get(data, "data.user.result.timeline.timeline.instructions.0.entries")
         cursor_bottom = None
+        cursor_top = None
         tweets = []
+        sort_indexes = []
         for entry in entries:
             if "cursor-bottom" in entry["entryId"]:
                 cursor_bottom = get(entry, "content.value")
+            elif "cursor-top" in entry["entryId"]:
+                cursor_top = get(entry, "content.value")
             else:
                 tweet = get(
                     entry, "content.itemContent.tweet_results.result.tweet"
@@ -422,96 +587,137 @@ class TwitterAPI:
                     and "Advertisers" not in tweet.get("source")
                 ):
                     tweets.append(self._filter(tweet))
-        return Success({"cursor_bottom": cursor_bottom, "tweets": tweets})
-
-    def get_all_likes(self) -> Result[Dict[str, Any], Exception]:
-        if os.path.exists("cache/cache_likes.json"):
-            with open("cache/cache_likes.json", "r", encoding="utf-8") as f:
-                all_datas = json.load(f)
-            bottom_cursor = get(all_datas[-1], "cursor_bottom")
-            shutil.rmtree("cache", ignore_errors=True)
-        else:
-            all_datas = []
-            bottom_cursor = ""
+                    sort_indexes.append(get(entry, "sortIndex"))
+        return {
+            "cursor_bottom": cursor_bottom,
+            "cursor_top": cursor_top,
+            "tweets": tweets,
+            # 与 tweets 一一对应，点赞时间线中按从新到旧递减
+            "sort_indexes": sort_indexes,
+        }
+
+    def get_all_likes(
+        self, cache_path: str = "cache/cache_likes.jsonl"
+    ) -> Result[Dict[str, Any], Exception]:
+        """Fetch the whole likes timeline, checkpointing every page to ``cache_path``.
+
+        An interrupted run resumes from the last cached bottom cursor; the cache
+        is removed once the timeline has been fully read.
+        """
+        all_datas = []
+        bottom_cursor = ""
+        if os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        all_datas.append(loads(line))
+                    except json.JSONDecodeError:
+                        break
+            if all_datas:
+                bottom_cursor = get(all_datas[-1], "cursor_bottom")
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+
         pbar = tqdm(desc="Get all likes")
-        while True:
-            try:
-                data = self._likes_chunk(bottom_cursor).unwrap()
+        pbar.update(sum(len(get(data, "tweets")) for data in all_datas))
+        with open(cache_path, "a", encoding="utf-8") as cache:
+            while True:
+                try:
+                    data = self._likes_chunk(bottom_cursor).unwrap()
+                except Exception as e:
+                    return Failure(e)
                 bottom_cursor = get(data, "cursor_bottom")
                 if not get(data, "tweets"):
                     break
                 pbar.update(len(get(data, "tweets")))
                 all_datas.append(data)
-            except Exception as e:
-                os.mkdir("cache", exist_ok=True)
-                with open("cache/cache_likes.json", "w", encoding="utf-8") as f:
-                    json.dump(all_datas, f, ensure_ascii=False, indent=4)
-                return Failure(e)
+                cache.write(json.dumps(data, ensure_ascii=False) + "\n")
+                cache.flush()
+        os.remove(cache_path)
         return Success([tweet for data in all_datas for tweet in get(data, "tweets")])
 
-    def _reply_chunk(
-        self, id: str, cursor: str = ""
-    ) -> Result[Dict[str, Any], Exception]:
-        def tweet(data) -> Maybe[Dict[str, Any]]:
-            detail: Dict[str, Any] = get(
-                data,
-                "item.itemContent.tweet_results.result.tweet",
-            ) or get(data, "item.itemContent.tweet_results.result")
-            if not detail:
-                return Nothing
-            if get(detail, "__typename") in ["TweetTombstone"]:
-                return Nothing
-            if "Advertisers" in detail.get("source", ""):
-                return Nothing
-
-            return Some(detail)
-
-        data = self._get_authenticated_tweet_details(id, cursor).unwrap()
-        entries = get(
+    def _reply_tweet(self, data) -> Maybe[Dict[str, Any]]:
+        detail: Dict[str, Any] = get(
+            data,
+            "item.itemContent.tweet_results.result.tweet",
+        ) or get(data, "item.itemContent.tweet_results.result")
+        if not detail:
+            return Nothing
+        if get(detail, "__typename") in ["TweetTombstone"]:
+            return Nothing
+        if "Advertisers" in detail.get("source", ""):
+            return Nothing
+
+        return Some(detail)
+
+    def _reply_entries(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return get(
             data, "data.threaded_conversation_with_injections_v2.instructions.0.entries"
         )
+
+    def _showmore_cursors(self, entries: List[Dict[str, Any]]) -> List[str]:
+        """收集本页所有对话中的 ShowMore 游标"""
+        return [
+            get(reply, "item.itemContent.value")
+            for entry in entries or []
+            if "conversationthread" in entry["entryId"]
+            for reply in get(entry, "content.items")
+            if "ShowMore" == get(reply, "item.itemContent.cursorType")
+        ]
+
+    def _assemble_reply_chunk(
+        self, entries: List[Dict[str, Any]], expansions: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """将一页回复与已获取的 ShowMore 展开结果按原顺序组装"""
         cursor_bottom = None
         conversation_threads = []
 
-        if not entries:
-            return Success(
-                {
-                    "cursor_bottom": cursor_bottom,
-                    "conversation_threads": conversation_threads,
-                }
-            )
-
-        for entry in entries:
+        for entry in entries or []:
             if "conversationthread" in entry["entryId"]:
                 conversation = []
                 for reply in get(entry, "content.items"):
                     if "ShowMore" == get(reply, "item.itemContent.cursorType"):
-                        showmore = get(reply, "item.itemContent.value")
-                        replymore = self._get_authenticated_tweet_details(
-                            id, showmore
-                        ).unwrap()
+                        replymore = expansions[get(reply, "item.itemContent.value")]
                         entriesmore = get(
                             replymore,
                             "data.threaded_conversation_with_injections_v2.instructions.0.moduleItems",
                         )
-                        for entrymore in entriesmore:
-                            tweet(entrymore).bind_optional(self._filter).bind_optional(
-                                conversation.append
-                            )
+                        for entrymore in entriesmore or []:
+                            self._reply_tweet(entrymore).bind_optional(
+                                self._filter
+                            ).bind_optional(conversation.append)
                         continue
-                    tweet(reply).bind_optional(self._filter).bind_optional(
+                    self._reply_tweet(reply).bind_optional(self._filter).bind_optional(
                         conversation.append
                     )
                 conversation_threads.append({"conversation": conversation})
             elif "Bottom" == get(entry, "content.itemContent.cursorType"):
                 cursor_bottom = get(entry, "content.itemContent.value")
 
-        return Success(
-            {
-                "cursor_bottom": cursor_bottom,
-                "conversation_threads": conversation_threads,
-            }
-        )
+        return {
+            "cursor_bottom": cursor_bottom,
+            "conversation_threads": conversation_threads,
+        }
+
+    def _reply_chunk(
+        self, id: str, cursor: str = ""
+    ) -> Result[Dict[str, Any], Exception]:
+        data = self._get_authenticated_tweet_details(id, cursor).unwrap()
+        entries = self._reply_entries(data)
+        expansions = self._expand_showmore(id, self._showmore_cursors(entries))
+        return Success(self._assemble_reply_chunk(entries, expansions))
+
+    def _expand_showmore(self, id: str, cursors: List[str]) -> Dict[str, Dict]:
+        """Fetch the ShowMore expansions of a page concurrently, keyed by cursor."""
+        cursors = list(dict.fromkeys(cursors))
+
+        def expand(showmore: str) -> Dict[str, Any]:
+            return self._get_authenticated_tweet_details(id, showmore).unwrap()
+
+        if len(cursors) <= 1:
+            return {showmore: expand(showmore) for showmore in cursors}
+        # 所有回复线程共用一个线程池，线程数不随回复线程数增长
+        pool = shared_showmore_executor(self.settings)
+        return dict(zip(cursors, pool.map(expand, cursors)))
 
     def _get_reply(self, id: str) -> Result[Dict[str, Any], Exception]:
         all_datas = []
@@ -528,82 +734,140 @@ class TwitterAPI:
     @retry(
         stop=stop_after_attempt(10),
         wait=wait_exponential(max=60),
-        before=reset_guest_token,
+        retry=retry_if_not_exception_type(CircuitOpenError),
         retry_error_callback=print_error_stack,
     )
     def _guest_response(self, tweet_id: str) -> Result[Dict[str, Any], Exception]:
-        headers = self._get_guest_headers()
+        token = self.guest_tokens.acquire()
+        headers = self._get_guest_headers(token)
         params = self._get_tweet_guest_params(tweet_id)
-        with httpx.Client(proxy=self._choose_proxy(), timeout=10) as client:
+        breaker = self.breakers["GuestTweetDetail"]
+        with self._proxied_client() as client, breaker.guard():
             response = client.get(
                 self.guest_tweet_detail_url,
                 headers=headers,
                 params=params,
             )
+            self._reject_guest_token(token, response.status_code)
             response.raise_for_status()
-            return Success(response.json())
+            return Success(loads(response.content))
 
-    @retry(
-        stop=stop_after_attempt(20),
-        wait=wait_exponential(min=60, max=660),
-        reraise=True,
-    )
     def _get_authenticated_tweet_details(
         self, tweet_id: str, cursor: str = ""
     ) -> Result[Dict[str, Any], Exception]:
-        """获取认证后的推文详情"""
+        """获取认证后的推文详情
+
+        Errors other than rate limits are raised at once rather than retried
+        here: the caller's scheduler re-queues the work after a backoff, so no
+        worker sleeps on a failing request.
+        """
+        # 先查缓存，离线重新解析时不需要 cookie
+        cached, fresh, validators = self._cached_detail(tweet_id, cursor)
+        if fresh:
+            return Success(cached)
         if not self.cookie:
             return Failure(
                 ValueError("Authentication required but no cookies available")
             )
 
         while True:
-            with self.key_manager.context(self.settings.xpool or [self.cookie]) as key:
+            if not (keys := self._account_keys()):
+                return Failure(ValueError("All pooled accounts are quarantined"))
+            with self.key_manager.context(keys, ordered=self.use_pool) as key:
+                started = time.monotonic()
                 try:
+                    # 多个线程共享同一个实例，选中的 cookie 只能放在局部变量里
+                    cookie = self.cookie
                     if self.use_pool:
-                        decoded_data = base64.b64decode(key).decode("utf-8")
-                        self.cookie = self.parse_cookie_string(decoded_data).unwrap()
-                    headers = self._get_auth_headers(self.cookie)
+                        cookie = self._account_cookie(key)
+                    headers = {
+                        **self._get_auth_headers(cookie),
+                        **ResponseCache.conditional_headers(validators),
+                    }
                     params = self._get_tweet_auth_params(tweet_id, cursor)
-                    with httpx.Client(proxy=self._choose_proxy(), timeout=10) as client:
+                    breaker = self.breakers["TweetDetail"]
+                    with self._proxied_client() as client, breaker.guard() as call:
                         response = client.get(
                             self.auth_tweet_detail_url,
                             headers=headers,
                             params=params,
                         )
-                        response.raise_for_status()
-                        res = response.json()
-                    if str(get(res, "errors.0.code")) == "144":
+                        self._rate_limit(key, response)
+                        res = self._detail_response(response, cached)
+                        code = str(get(res, "errors.0.code"))
+                        if not get(res, "data") and code != "144":
+                            call.fail()
+                    if code == "144":
+                        self._record_account(key, True, started, response)
                         return Success({})
-                    if not res:
-                        continue
                     if not get(res, "data"):
-                        if str(get(res, "errors.0.code")) == "326":
+                        self._record_account(key, False, started, response)
+                        if code == "326":
                             if self.use_pool:
-                                print("errors lock", key)
-                                self.settings.xpool.remove(key)
-                            else:
-                                return Failure(
-                                    ValueError(
-                                        "You are locked out, please login X to unlock"
-                                    )
+                                # 换个账号重试，全部隔离后会返回 Failure
+                                self.accounts.quarantine(key, "locked (326)")
+                                continue
+                            return Failure(
+                                ValueError(
+                                    "You are locked out, please login X to unlock"
                                 )
-                        continue
+                            )
+                        # 交给调度器退避重试，不在这里空转
+                        return Failure(self._detail_error(res))
+                    self._record_account(key, True, started, response)
+                    # 304 响应不带校验头，沿用缓存中的
+                    self._cache_detail(
+                        tweet_id, cursor, res, {**validators, **response.headers}
+                    )
                     return Success(res)
                 except (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout):
+                    self._record_account(key, False, started)
                     continue
                 except httpx.HTTPStatusError as e:
+                    self._record_account(key, False, started, e.response)
                     if e.response.status_code == 429:
-                        if self.use_pool:
-                            self.key_manager.mark_key_cooldown(key)
-                            continue
-                        else:
-                            time.sleep(660)
-                            continue
+                        # 冷却到服务端给出的重置时间，没有时按固定时长
+                        self.key_manager.mark_key_cooldown(
+                            key, until=self._rate_limit(key, e.response)
+                        )
+                        continue
                     raise e
+                except CircuitOpenError:
+                    raise
                 except Exception as e:
                     return Failure(e)
 
+    def _cached_detail(
+        self, tweet_id: str, cursor: str
+    ) -> Tuple[Optional[Dict[str, Any]], bool, Dict[str, str]]:
+        if self.detail_cache is None:
+            return None, False, {}
+        return self.detail_cache.get("TweetDetail", tweet_id, cursor)
+
+    def _cache_detail(
+        self, tweet_id: str, cursor: str, data: Dict[str, Any], headers
+    ):
+        if self.detail_cache is not None:
+            self.detail_cache.put("TweetDetail", tweet_id, cursor, data, headers)
+
+    @staticmethod
+    def _detail_error(res: Dict[str, Any]) -> ValueError:
+        if errors := get(res, "errors"):
+            message = "; ".join(
+                f"{e.get('code')}: {e.get('message')}" for e in errors
+            )
+            return ValueError(f"TweetDetail returned no data ({message})")
+        return ValueError("TweetDetail returned an empty response")
+
+    def _detail_response(
+        self, response: httpx.Response, cached: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Body of a TweetDetail response; a 304 revalidates the cached copy."""
+        if response.status_code == 304 and cached is not None:
+            return cached
+        response.raise_for_status()
+        return loads(response.content)
+
     def _check_result(
         self, response_data: Dict[str, Any]
     ) -> Result[Dict[str, Any], Exception]:
@@ -642,6 +906,13 @@ class TwitterAPI:
 
         return Success(result)
 
+    @staticmethod
+    def _needs_login(response_data: Dict[str, Any]) -> bool:
+        return (
+            response_data.get("type") == "unavailable"
+            and response_data.get("reason") == "NsfwLoggedOut"
+        )
+
     def _process_tweet_details(self, result: Dict[str, Any]) -> Dict[str, Any]:
         """处理推文详情的公共逻辑"""
         try:
@@ -669,10 +940,7 @@ class TwitterAPI:
         response_data = guest_response.unwrap()
 
         # 判断推文是否需要登录才能访问
-        if (
-            response_data.get("type") == "unavailable"
-            and response_data.get("reason") == "NsfwLoggedOut"
-        ):
+        if self._needs_login(response_data):
             auth_response = self._get_authenticated_tweet_details(tweet_id).bind(
                 self._check_result
             )
@@ -897,3 +1165,249 @@ class TwitterAPI:
             else quote_data
         )
         return {**parse_tweet(data), "quote": parse_tweet(quote)}
+
+
+class AsyncTwitterAPI(TwitterAPI):
+    """asyncio counterpart of TwitterAPI.
+
+    Request building and response parsing (``_filter``, ``_check_result``) are
+    inherited; only the network calls are replaced by coroutines sharing one
+    ``httpx.AsyncClient`` per proxy. Public entry points are ``likes_chunk``,
+    ``reply_chunk``, ``get_tweet_details``, ``self_info`` and
+    ``get_many_tweet_details``.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._clients: Dict[Optional[str], httpx.AsyncClient] = {}
+
+    def _client(self, proxy: Optional[str] = None) -> httpx.AsyncClient:
+        if proxy not in self._clients:
+            self._clients[proxy] = httpx.AsyncClient(
+                proxy=proxy,
+                http2=self.http_pool.http2,
+                limits=self.http_pool.limits,
+                timeout=self.http_pool.timeout,
+            )
+        return self._clients[proxy]
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+    async def _get_authenticated_tweet_details(
+        self, tweet_id: str, cursor: str = ""
+    ) -> Result[Dict[str, Any], Exception]:
+        """获取认证后的推文详情（错误直接抛出，由调度器延后重试）"""
+        # 先查缓存，离线重新解析时不需要 cookie
+        cached, fresh, validators = self._cached_detail(tweet_id, cursor)
+        if fresh:
+            return Success(cached)
+        if not self.cookie:
+            return Failure(
+                ValueError("Authentication required but no cookies available")
+            )
+
+        while True:
+            if not (keys := self._account_keys()):
+                return Failure(ValueError("All pooled accounts are quarantined"))
+            async with self.key_manager.acontext(keys, ordered=self.use_pool) as key:
+                started = time.monotonic()
+                try:
+                    cookie = self.cookie
+                    if self.use_pool:
+                        cookie = self._account_cookie(key)
+                    with self.breakers["TweetDetail"].guard() as call:
+                        response = await self._request(
+                            self.auth_tweet_detail_url,
+                            headers={
+                                **self._get_auth_headers(cookie),
+                                **ResponseCache.conditional_headers(validators),
+                            },
+                            params=self._get_tweet_auth_params(tweet_id, cursor),
+                        )
+                        self._rate_limit(key, response)
+                        res = self._detail_response(response, cached)
+                        code = str(get(res, "errors.0.code"))
+                        if not get(res, "data") and code != "144":
+                            call.fail()
+                    if code == "144":
+                        self._record_account(key, True, started, response)
+                        return Success({})
+                    if not get(res, "data"):
+                        self._record_account(key, False, started, response)
+                        if code == "326":
+                            if self.use_pool:
+                                # 换个账号重试，全部隔离后会返回 Failure
+                                self.accounts.quarantine(key, "locked (326)")
+                                continue
+                            return Failure(
+                                ValueError(
+                                    "You are locked out, please login X to unlock"
+                                )
+                            )
+                        # 交给调度器退避重试，不在这里空转
+                        return Failure(self._detail_error(res))
+                    self._record_account(key, True, started, response)
+                    # 304 响应不带校验头，沿用缓存中的
+                    self._cache_detail(
+                        tweet_id, cursor, res, {**validators, **response.headers}
+                    )
+                    return Success(res)
+                except (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout):
+                    self._record_account(key, False, started)
+                    continue
+                except httpx.HTTPStatusError as e:
+                    self._record_account(key, False, started, e.response)
+                    if e.response.status_code == 429:
+                        self.key_manager.mark_key_cooldown(
+                            key, until=self._rate_limit(key, e.response)
+                        )
+                        continue
+                    raise e
+                except CircuitOpenError:
+                    raise
+                except Exception as e:
+                    return Failure(e)
+
+    async def _reply_chunk(
+        self, id: str, cursor: str = ""
+    ) -> Result[Dict[str, Any], Exception]:
+        data = (await self._get_authenticated_tweet_details(id, cursor)).unwrap()
+        entries = self._reply_entries(data)
+        expansions = await self._expand_showmore(id, self._showmore_cursors(entries))
+        return Success(self._assemble_reply_chunk(entries, expansions))
+
+    async def _expand_showmore(self, id: str, cursors: List[str]) -> Dict[str, Dict]:
+        cursors = list(dict.fromkeys(cursors))
+        limit = asyncio.Semaphore(max(self.settings.showmore_concurrency, 1))
+
+        async def expand(showmore: str) -> Dict[str, Any]:
+            async with limit:
+                return (
+                    await self._get_authenticated_tweet_details(id, showmore)
+                ).unwrap()
+
+        return dict(zip(cursors, await asyncio.gather(*map(expand, cursors))))
+
+    async def _get_reply(self, id: str) -> Result[Dict[str, Any], Exception]:
+        all_datas = []
+        bottom_cursor = ""
+        while True:
+            data = (await self._reply_chunk(id, bottom_cursor)).unwrap()
+            all_datas.extend(get(data, "conversation_threads"))
+            if get(data, "cursor_bottom") is None:
+                break
+            bottom_cursor = get(data, "cursor_bottom")
+
+        return Success(all_datas)
+
+    async def _request(self, url: str, headers: Dict, params: Dict) -> httpx.Response:
+        proxy = self._choose_proxy()
+        with self.proxy_manager.track(proxy):
+            return await self._client(proxy).get(url, headers=headers, params=params)
+
+    async def _get(self, url: str, headers: Dict, params: Dict) -> httpx.Response:
+        response = await self._request(url, headers, params)
+        response.raise_for_status()
+        return response
+
+    async def _self_info(self) -> Result[Dict[str, Any], Exception]:
+        headers = self._get_auth_headers(self.cookie)
+        params = self._get_user_info_params(
+            get_cookie_value(self.cookie, "twid").replace("u%3D", "")
+        )
+        response = await self._get(self.auth_user_info_url, headers, params)
+        return Success(loads(response.content))
+
+    async def self_info(self) -> Result[Dict[str, Any], Exception]:
+        return await self._self_info()
+
+    @retry(
+        stop=stop_after_attempt(10),
+        wait=wait_exponential(max=60),
+        retry=retry_if_not_exception_type(CircuitOpenError),
+        retry_error_callback=print_error_stack,
+    )
+    async def _likes(self, cursor: str = "") -> Result[Dict[str, Any], Exception]:
+        headers = self._get_auth_headers(self.cookie)
+        params = self._get_likes_auth_params(cursor)
+        limiter = self.likes_key_manager
+        async with limiter.acontext([self.cookie]) as key:
+            with self.breakers["Likes"].guard():
+                response = await self._request(self.auth_likes_url, headers, params)
+                reset_at = self._rate_limit(key, response, limiter)
+                if response.status_code == 429:
+                    limiter.mark_key_cooldown(key, until=reset_at)
+                response.raise_for_status()
+                return Success(loads(response.content))
+
+    async def _likes_chunk(self, cursor: str = "") -> Result[Dict[str, Any], Exception]:
+        return Success(self._parse_likes((await self._likes(cursor)).unwrap()))
+
+    async def likes_chunk(self, cursor: str = "") -> Result[Dict[str, Any], Exception]:
+        return await self._likes_chunk(cursor)
+
+    async def reply_chunk(
+        self, id: str, cursor: str = ""
+    ) -> Result[Dict[str, Any], Exception]:
+        return await self._reply_chunk(id, cursor)
+
+    @retry(
+        stop=stop_after_attempt(10),
+        wait=wait_exponential(max=60),
+        retry=retry_if_not_exception_type(CircuitOpenError),
+        retry_error_callback=print_error_stack,
+    )
+    async def _guest_response(self, tweet_id: str) -> Result[Dict[str, Any], Exception]:
+        # 池为空时 acquire 会阻塞等待补充，放到线程里避免卡住事件循环
+        token = await asyncio.to_thread(self.guest_tokens.acquire)
+        headers = self._get_guest_headers(token)
+        params = self._get_tweet_guest_params(tweet_id)
+        with self.breakers["GuestTweetDetail"].guard():
+            try:
+                response = await self._get(self.guest_tweet_detail_url, headers, params)
+            except httpx.HTTPStatusError as e:
+                self._reject_guest_token(token, e.response.status_code)
+                raise
+            return Success(loads(response.content))
+
+    async def get_tweet_details(self, tweet_id: str) -> Dict[str, Any]:
+        """获取推文详情"""
+        guest_response = (await self._guest_response(tweet_id)).bind(
+            self._check_result
+        )
+        if isinstance(guest_response, Failure):
+            raise guest_response.failure()
+        response_data = guest_response.unwrap()
+
+        if self._needs_login(response_data):
+            auth_response = (
+                await self._get_authenticated_tweet_details(tweet_id)
+            ).bind(self._check_result)
+            if isinstance(auth_response, Failure):
+                raise auth_response.failure()
+            response_data = auth_response.unwrap()
+
+        return self._process_tweet_details(response_data)
+
+    async def get_many_tweet_details(
+        self, tweet_ids: List[str], concurrency: Optional[int] = None
+    ) -> Dict[str, Result[Dict[str, Any], Exception]]:
+        """Look up many tweets concurrently, keyed by id.
+
+        At most ``concurrency`` lookups run at once (default: one per pooled
+        cookie); logged-in fallbacks additionally wait on the cookie pool's
+        rate limits, so the fan-out never outruns the accounts.
+        """
+        limit = asyncio.Semaphore(concurrency or max(len(self.settings.xpool), 1))
+
+        async def lookup(tweet_id: str):
+            async with limit:
+                try:
+                    return tweet_id, Success(await self.get_tweet_details(tweet_id))
+                except Exception as e:
+                    return tweet_id, Failure(e)
+
+        return dict(await asyncio.gather(*map(lookup, tweet_ids)))
@@ -1,10 +1,11 @@
+import asyncio
 import random
 import time
 from abc import ABC, abstractmethod
 from collections import deque
 from enum import Enum
 from threading import Condition, Lock
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import httpx
 from pydantic import ConfigDict, Field, field_validator
@@ -137,6 +138,9 @@ class KeyManager:
         # 当前被占用的密钥（如果不允许并发，则同一时间只允许一个线程占用某个特定密钥）
         self.occupied_keys: set = set()
 
+        # 服务端返回的剩余额度和重置时间戳，有值时代替 RPM 估算
+        self.server_budgets: Dict[str, Tuple[int, float]] = {}
+
         self._lock = Lock()
         self._condition = Condition(self._lock)
 
@@ -152,6 +156,18 @@ class KeyManager:
         while rq and rq[0] <= current_time - 60:
             rq.popleft()
 
+    def _server_budget(self, internal_key: str, current_time: float) -> Optional[int]:
+        """服务端报告的剩余额度，未知或已过重置时间时返回 None"""
+        budget = self.server_budgets.get(internal_key)
+        if budget is None:
+            return None
+        if current_time >= budget[1]:
+            # 服务端窗口已重置，之前的请求记录不再计入 RPM
+            del self.server_budgets[internal_key]
+            self.request_counts[internal_key] = deque()
+            return None
+        return budget[0]
+
     def _is_key_available(self, internal_key: str, current_time: float) -> bool:
         """
         检查key在当前时刻是否可用：
@@ -167,9 +183,13 @@ class KeyManager:
             else:
                 del self.cooldown_keys[internal_key]
 
-        # 检查RPM限制
+        # 检查RPM限制，知道服务端额度时以额度为准
         self._clean_old_requests(internal_key, current_time)
-        if len(self.request_counts[internal_key]) >= self.rpm:
+        budget = self._server_budget(internal_key, current_time)
+        if budget is not None:
+            if budget <= 0:
+                return False
+        elif len(self.request_counts[internal_key]) >= self.rpm:
             return False
 
         # 检查并发占用
@@ -192,8 +212,13 @@ class KeyManager:
         ):
             wait_time = max(wait_time, self.cooldown_keys[internal_key] - current_time)
 
+        # 服务端额度用完时，等到重置时间
+        budget = self.server_budgets.get(internal_key)
+        if budget is not None and current_time < budget[1]:
+            if budget[0] <= 0:
+                wait_time = max(wait_time, budget[1] - current_time)
         # 如果达到了 RPM 限制，需要等待最早一次请求时间戳满60秒后再重试
-        if (
+        elif (
             internal_key in self.request_counts
             and len(self.request_counts[internal_key]) >= self.rpm
         ):
@@ -215,6 +240,10 @@ class KeyManager:
             current_time = time.time()
             self._clean_old_requests(internal_key, current_time)
             self.request_counts[internal_key].append(current_time)
+            # 先在本地扣减额度，响应回来后再以服务端的数字为准
+            if internal_key in self.server_budgets:
+                remaining, reset_at = self.server_budgets[internal_key]
+                self.server_budgets[internal_key] = (remaining - 1, reset_at)
             if not self.allow_concurrent:
                 self.occupied_keys.add(internal_key)
             self._condition.notify_all()
@@ -227,8 +256,17 @@ class KeyManager:
                 self.occupied_keys.remove(internal_key)
             self._condition.notify_all()
 
-    def mark_key_cooldown(self, key: Any):
-        """将密钥标记为进入冷却状态，如果连续3次进入长时冷却"""
+    def update_rate_limit(self, key: Any, remaining: int, reset_at: float):
+        """记录服务端返回的剩余额度（x-rate-limit-remaining）和重置时间戳
+        （x-rate-limit-reset），额度用完的密钥在重置时间到达时恢复可用"""
+        internal_key = self._hash_key(key)
+        with self._lock:
+            self.server_budgets[internal_key] = (remaining, reset_at)
+            self._condition.notify_all()
+
+    def mark_key_cooldown(self, key: Any, until: Optional[float] = None):
+        """将密钥标记为进入冷却状态，如果连续3次进入长时冷却。
+        给出 until（例如服务端的重置时间戳）时冷却到该时刻为止"""
         internal_key = self._hash_key(key)
         with self._lock:
             current_time = time.time()
@@ -236,7 +274,10 @@ class KeyManager:
                 self.consecutive_cooldown_counts.get(internal_key, 0) + 1
             )
 
-            if self.consecutive_cooldown_counts[internal_key] >= 3:
+            if until is not None:
+                # 重置时间只精确到秒，已过时也稍等一下再试
+                self.cooldown_keys[internal_key] = max(until, current_time + 1)
+            elif self.consecutive_cooldown_counts[internal_key] >= 3:
                 self.cooldown_keys[internal_key] = current_time + 3600  # 1小时冷却
             else:
                 self.cooldown_keys[internal_key] = current_time + self.cooldown_time
@@ -245,7 +286,56 @@ class KeyManager:
                 self.occupied_keys.remove(internal_key)
             self._condition.notify_all()
 
-    def get_available_key(self, keys: List[Any]) -> Any:
+    def _pick_key(
+        self, keys: List[Any], current_time: float, ordered: bool = False
+    ) -> Optional[Any]:
+        """在持有锁的前提下挑选一个可用密钥并占用，没有则返回 None。
+        ordered 为 True 时按给定顺序优先（例如按账号健康度排好序）"""
+        shuffled_keys = keys.copy()
+        if not ordered:
+            random.shuffle(shuffled_keys)
+
+        for key in shuffled_keys:
+            internal_key = self._hash_key(key)
+            if not self._is_key_available(internal_key, current_time):
+                continue
+            # 优先选择未被占用的密钥
+            if self.allow_concurrent or internal_key not in self.occupied_keys:
+                self._clean_old_requests(internal_key, current_time)
+                if not self.allow_concurrent:
+                    self.occupied_keys.add(internal_key)
+                return key
+        return None
+
+    def _min_wait_time(self, keys: List[Any], current_time: float) -> float:
+        """所有密钥中最短的等待时间"""
+        min_wait_time = float("inf")
+        for key in keys:
+            internal_key = self._hash_key(key)
+            wait_time = self._get_wait_time_for_key(internal_key, current_time)
+            if wait_time < min_wait_time:
+                min_wait_time = wait_time
+        return min_wait_time
+
+    def capacity(self, keys: List[Any]) -> int:
+        """当前可以同时发出的请求数：跳过冷却中和已达 RPM 上限的密钥，
+        允许并发时按剩余额度计，否则每个密钥计 1"""
+        with self._lock:
+            current_time = time.time()
+            total = 0
+            for key in keys:
+                internal_key = self._hash_key(key)
+                if current_time < self.cooldown_keys.get(internal_key, 0):
+                    continue
+                self._clean_old_requests(internal_key, current_time)
+                remaining = self._server_budget(internal_key, current_time)
+                if remaining is None:
+                    remaining = self.rpm - len(self.request_counts[internal_key])
+                if remaining > 0:
+                    total += remaining if self.allow_concurrent else 1
+            return total
+
+    def get_available_key(self, keys: List[Any], ordered: bool = False) -> Any:
         """获取一个可用的密钥，如果没有可用的则阻塞等待"""
         if not keys:
             raise ValueError("未提供任何 API 密钥")
@@ -253,27 +343,9 @@ class KeyManager:
         with self._lock:
             while True:
                 current_time = time.time()
-                shuffled_keys = keys.copy()
-                random.shuffle(shuffled_keys)
-
-                available_keys = []
-                for key in shuffled_keys:
-                    internal_key = self._hash_key(key)
-                    if self._is_key_available(internal_key, current_time):
-                        available_keys.append(key)
-
-                if available_keys:
-                    # 优先选择未被占用的密钥
-                    for key in available_keys:
-                        internal_key = self._hash_key(key)
-                        if (
-                            self.allow_concurrent
-                            or internal_key not in self.occupied_keys
-                        ):
-                            self._clean_old_requests(internal_key, current_time)
-                            if not self.allow_concurrent:
-                                self.occupied_keys.add(internal_key)
-                            return key
+                key = self._pick_key(keys, current_time, ordered)
+                if key is not None:
+                    return key
 
                 # 判断是否有密钥仅被占用但未冷却
                 occupied_only = [
@@ -289,12 +361,7 @@ class KeyManager:
                     continue  # 重新检查密钥状态
 
                 # 如果没有仅被占用的密钥，计算最小等待时间
-                min_wait_time = float("inf")
-                for key in keys:
-                    internal_key = self._hash_key(key)
-                    wait_time = self._get_wait_time_for_key(internal_key, current_time)
-                    if wait_time < min_wait_time:
-                        min_wait_time = wait_time
+                min_wait_time = self._min_wait_time(keys, current_time)
 
                 if min_wait_time == float("inf"):
                     raise RuntimeError("无法确定密钥的等待时间，可能没有可用密钥。")
@@ -317,7 +384,24 @@ class KeyManager:
                 wait_time = min_wait_time if min_wait_time > 0 else None
                 self._condition.wait(timeout=wait_time)
 
-    def context(self, keys: List[Any]):
+    async def aget_available_key(
+        self, keys: List[Any], poll: float = 1.0, ordered: bool = False
+    ) -> Any:
+        """get_available_key 的协程版本，等待期间让出事件循环而不是阻塞线程"""
+        if not keys:
+            raise ValueError("未提供任何 API 密钥")
+
+        while True:
+            with self._lock:
+                current_time = time.time()
+                key = self._pick_key(keys, current_time, ordered)
+                if key is not None:
+                    return key
+                min_wait_time = self._min_wait_time(keys, current_time)
+            # 被占用的密钥释放时无法收到通知，因此最多等待 poll 秒后重新检查
+            await asyncio.sleep(min(max(min_wait_time, 0.05), poll))
+
+    def context(self, keys: List[Any], ordered: bool = False):
         """
         上下文管理器，用于自动释放密钥。例如：
             with key_manager.context(keys) as key:
@@ -345,9 +429,34 @@ class KeyManager:
                         self.manager.consecutive_cooldown_counts[internal_key] = 0
                     self.manager.release_key(self.key)
 
-        key = self.get_available_key(keys)
+        key = self.get_available_key(keys, ordered)
         return KeyContext(self, key)
 
+    def acontext(self, keys: List[Any], ordered: bool = False):
+        """
+        异步上下文管理器，密钥在进入时才获取。例如：
+            async with key_manager.acontext(keys) as key:
+                # 使用 key 进行请求
+        """
+
+        class AsyncKeyContext:
+            def __init__(self, manager: KeyManager):
+                self.manager = manager
+                self.key = None
+
+            async def __aenter__(self):
+                self.key = await self.manager.aget_available_key(keys, ordered=ordered)
+                self.manager.mark_key_used(self.key)
+                return self.key
+
+            async def __aexit__(self, exc_type, exc_val, exc_tb):
+                if exc_type is None:
+                    internal_key = self.manager._hash_key(self.key)
+                    self.manager.consecutive_cooldown_counts[internal_key] = 0
+                self.manager.release_key(self.key)
+
+        return AsyncKeyContext(self)
+
 
 # ========== BaseClient Class ==========
 class BaseClient(ABC):
@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from enum import Enum
+from typing import Callable, Deque, Iterator
+
+import httpx
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose breaker is open.
+
+    ``retry_after`` is the number of seconds until the breaker lets a trial
+    call through, so callers can defer the work instead of waiting on it.
+    """
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit {name} is open, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker over the outcomes of the last calls.
+
+    Once at least ``min_calls`` of the last ``window`` calls are known and the
+    share of failures reaches ``failure_rate``, the breaker opens: ``check``
+    raises ``CircuitOpenError`` for ``open_seconds``. It then goes half-open
+    and lets ``half_open_calls`` trial calls through; a success closes it, a
+    failure opens it again for twice as long (up to ``max_open_seconds``).
+    ``clock`` returns the current time in seconds (``time.monotonic``).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 10,
+        window: int = 20,
+        open_seconds: float = 30,
+        max_open_seconds: float = 600,
+        half_open_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+
+        self.state = CircuitState.CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._open_for = open_seconds
+        self._trials = 0
+        self._lock = threading.Lock()
+
+    def _open(self, now: float, longer: bool = False):
+        self.state = CircuitState.OPEN
+        self._opened_at = now
+        if longer:
+            self._open_for = min(self._open_for * 2, self.max_open_seconds)
+        self._outcomes.clear()
+        self._trials = 0
+
+    def check(self):
+        """Reserve a call, or raise ``CircuitOpenError`` if it must not be made."""
+        with self._lock:
+            now = self.clock()
+            if self.state is CircuitState.OPEN:
+                remaining = self._opened_at + self._open_for - now
+                if remaining > 0:
+                    raise CircuitOpenError(self.name, remaining)
+                self.state = CircuitState.HALF_OPEN
+                self._trials = 0
+            if self.state is CircuitState.HALF_OPEN:
+                # 半开时只放行有限的试探请求，其余的按很快会再判断处理
+                if self._trials >= self.half_open_calls:
+                    raise CircuitOpenError(self.name, 1)
+                self._trials += 1
+
+    def record(self, ok: bool):
+        with self._lock:
+            now = self.clock()
+            if self.state is CircuitState.HALF_OPEN:
+                if ok:
+                    self.state = CircuitState.CLOSED
+                    self._open_for = self.open_seconds
+                    self._outcomes.clear()
+                else:
+                    self._open(now, longer=True)
+                return
+            if self.state is CircuitState.OPEN:
+                return
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if (
+                len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_rate
+            ):
+                self._open(now)
+
+    @contextmanager
+    def guard(self) -> Iterator["_Call"]:
+        """``check``, run the block, and record how it went.
+
+        Transport errors, 5xx statuses and undecodable bodies count as
+        failures, as does ``call.fail()`` for responses that are useless
+        despite a 2xx status. A pool timeout never reached the endpoint, so
+        it records nothing. Anything else means the endpoint answered.
+        """
+        self.check()
+        call = _Call()
+        ok = True
+        try:
+            yield call
+        except httpx.PoolTimeout:
+            # 本地连接池耗尽，不能算作接口故障
+            self._release()
+            ok = None
+            raise
+        except (httpx.TransportError, ValueError):
+            ok = False
+            raise
+        except httpx.HTTPStatusError as e:
+            ok = e.response.status_code < 500
+            raise
+        finally:
+            if ok is not None:
+                self.record(ok and not call.failed)
+
+    def _release(self):
+        """Give back a reserved call that has no outcome to record."""
+        with self._lock:
+            if self.state is CircuitState.HALF_OPEN and self._trials:
+                self._trials -= 1
+
+
+class _Call:
+    failed = False
+
+    def fail(self):
+        self.failed = True
@@ -0,0 +1,85 @@
+import importlib.util
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+import httpx
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional ``h2`` package (``pip install httpx[http2]``)."""
+    return importlib.util.find_spec("h2") is not None
+
+
+class ClientPool:
+    """Thread-safe pool of keep-alive ``httpx.Client`` instances, one per proxy.
+
+    Clients are created on first use and reused by every thread, so requests
+    to the same host share connections (and HTTP/2 streams when available)
+    instead of paying a TCP+TLS handshake each time. A client left unused for
+    ``idle_timeout`` seconds is closed on the next checkout.
+    """
+
+    def __init__(
+        self,
+        http2: Optional[bool] = None,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30,
+        idle_timeout: float = 300,
+        timeout: float = 10,
+    ):
+        self.http2 = http2_available() if http2 is None else http2
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+
+        self._clients: Dict[Optional[str], httpx.Client] = {}
+        self._last_used: Dict[Optional[str], float] = {}
+        self._in_use: Dict[Optional[str], int] = {}
+        self._lock = threading.Lock()
+
+    def _evict_idle(self, now: float):
+        for proxy in list(self._clients):
+            idle = now - self._last_used[proxy] >= self.idle_timeout
+            if idle and not self._in_use.get(proxy):
+                self._clients.pop(proxy).close()
+                self._last_used.pop(proxy)
+                self._in_use.pop(proxy, None)
+
+    @contextmanager
+    def client(self, proxy: Optional[str] = None) -> Iterator[httpx.Client]:
+        """Check out the shared client for ``proxy``; it stays open afterwards."""
+        with self._lock:
+            now = time.monotonic()
+            self._evict_idle(now)
+            if proxy not in self._clients:
+                self._clients[proxy] = httpx.Client(
+                    proxy=proxy,
+                    http2=self.http2,
+                    limits=self.limits,
+                    timeout=self.timeout,
+                )
+            self._last_used[proxy] = now
+            self._in_use[proxy] = self._in_use.get(proxy, 0) + 1
+            client = self._clients[proxy]
+        try:
+            yield client
+        finally:
+            with self._lock:
+                if proxy in self._in_use:
+                    self._in_use[proxy] -= 1
+                    self._last_used[proxy] = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+            self._last_used.clear()
+            self._in_use.clear()
@@ -0,0 +1,53 @@
+"""JSON decoding for large API payloads.
+
+``loads``/``dumps`` use the fastest installed backend: orjson, then msgspec,
+then the standard library.
+"""
+
+import json
+from typing import Any, Callable, Dict, Union
+
+LOADERS: Dict[str, Callable[[Union[bytes, str]], Any]] = {"json": json.loads}
+DUMPERS: Dict[str, Callable[[Any], bytes]] = {
+    "json": lambda obj: json.dumps(obj, ensure_ascii=False).encode("utf-8")
+}
+
+try:
+    import orjson
+
+    LOADERS["orjson"] = orjson.loads
+    DUMPERS["orjson"] = orjson.dumps
+except ImportError:
+    pass
+
+try:
+    import msgspec
+
+    _msgspec_decoder = msgspec.json.Decoder()
+
+    def _msgspec_loads(data: Union[bytes, str]) -> Any:
+        try:
+            return _msgspec_decoder.decode(data)
+        except msgspec.DecodeError as e:
+            # 统一成 JSONDecodeError，调用方只需要捕获一种异常
+            raise json.JSONDecodeError(str(e), str(data[:100]), 0) from e
+
+    LOADERS["msgspec"] = _msgspec_loads
+    DUMPERS["msgspec"] = msgspec.json.Encoder().encode
+except ImportError:
+    pass
+
+BACKEND = next(name for name in ("orjson", "msgspec", "json") if name in LOADERS)
+_loads = LOADERS[BACKEND]
+_dumps = DUMPERS[BACKEND]
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Decode JSON with the fastest available backend."""
+    return _loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode to UTF-8 JSON bytes with the fastest available backend."""
+    return _dumps(obj)
+
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from returns.result import Result, Success, Failure
 from .models.gemini import BaseClient, GeminiClient
 
@@ -10,3 +12,14 @@ class LLMFactory:
                 return Success(GeminiClient())
             case _:
                 return Failure(ValueError(f"不支持的LLM类型: {llm_type}"))
+
+    @staticmethod
+    def capacity(llm_type: str = "gemini") -> Optional[int]:
+        """How many requests the shared key pool can serve right now."""
+        match llm_type.lower():
+            case "gemini":
+                return GeminiClient.key_manager.capacity(
+                    GeminiClient.settings.gemini_api_keys
+                )
+            case _:
+                return None
@@ -0,0 +1,136 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional
+
+import httpx
+
+
+@dataclass
+class ProxyHealth:
+    latency: Optional[float] = None
+    error_rate: float = 0.0
+    consecutive_failures: int = 0
+    ejections: int = 0
+    ejected_until: float = 0.0
+    # 探测请求的截止时间，0 表示没有探测在进行
+    probe_deadline: float = 0.0
+
+
+class ProxyManager:
+    """Pick proxies by measured latency and error rate.
+
+    ``track`` times each request and counts transport errors (connect/read
+    failures, timeouts, proxy errors) against the proxy; HTTP error statuses
+    mean the proxy delivered a response and count as success. A pool timeout
+    only means the local connection pool is exhausted and counts as neither. After
+    ``max_failures`` errors in a row a proxy is ejected for ``eject_base``
+    seconds, doubling per ejection up to ``eject_cap``. When that expires one
+    request is let through as a probe: success restores the proxy, failure
+    ejects it again for longer. A probe that has not reported back after
+    ``probe_timeout`` seconds counts as failed, so a hung request cannot keep
+    the proxy out of rotation for good. ``None`` stands for a direct connection.
+    """
+
+    def __init__(
+        self,
+        proxies: List[Optional[str]],
+        max_failures: int = 3,
+        eject_base: float = 30,
+        eject_cap: float = 1800,
+        alpha: float = 0.2,
+        probe_timeout: float = 120,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.proxies = list(dict.fromkeys(proxies)) or [None]
+        self.max_failures = max_failures
+        self.eject_base = eject_base
+        self.eject_cap = eject_cap
+        self.alpha = alpha
+        self.probe_timeout = probe_timeout
+        self.clock = clock
+        self._health: Dict[Optional[str], ProxyHealth] = {
+            proxy: ProxyHealth() for proxy in self.proxies
+        }
+        self._lock = threading.Lock()
+
+    def _weight(self, health: ProxyHealth) -> float:
+        # 还没有测量过的代理按 1 秒估计
+        latency = 1.0 if health.latency is None else health.latency
+        return (1 - health.error_rate) ** 2 / max(latency, 0.01)
+
+    def _eject(self, health: ProxyHealth, now: float):
+        health.ejections += 1
+        delay = min(self.eject_base * 2 ** (health.ejections - 1), self.eject_cap)
+        health.ejected_until = now + delay
+        health.probe_deadline = 0.0
+
+    def choose(self) -> Optional[str]:
+        """Weighted random pick among healthy proxies, or a due probe."""
+        with self._lock:
+            now = self.clock()
+            healthy = []
+            for proxy, health in self._health.items():
+                if health.probe_deadline:
+                    if health.probe_deadline > now:
+                        continue
+                    # 探测请求一直没有结果，按失败处理
+                    self._eject(health, now)
+                if health.ejected_until <= now:
+                    if health.ejections:
+                        # 驱逐期满，放一个请求过去探测
+                        health.probe_deadline = now + self.probe_timeout
+                        return proxy
+                    healthy.append(proxy)
+            if not healthy:
+                # 全部被驱逐时用最快恢复的那个，不让请求无路可走
+                return min(self._health, key=lambda p: self._health[p].ejected_until)
+            weights = [self._weight(self._health[p]) for p in healthy]
+            return random.choices(healthy, weights=weights)[0]
+
+    def record(self, proxy: Optional[str], ok: bool, latency: Optional[float] = None):
+        with self._lock:
+            health = self._health.get(proxy)
+            if health is None:
+                return
+            health.error_rate += self.alpha * ((not ok) - health.error_rate)
+            if ok:
+                if latency is not None and health.latency is None:
+                    health.latency = latency
+                elif latency is not None:
+                    health.latency += self.alpha * (latency - health.latency)
+                health.consecutive_failures = 0
+                health.ejections = 0
+                health.probe_deadline = 0.0
+                return
+            health.consecutive_failures += 1
+            probing = bool(health.probe_deadline)
+            if probing or health.consecutive_failures >= self.max_failures:
+                self._eject(health, self.clock())
+
+    @contextmanager
+    def track(self, proxy: Optional[str]) -> Iterator[None]:
+        """Measure the request made inside the block and record its outcome."""
+        started = self.clock()
+        ok = True
+        try:
+            yield
+        except httpx.PoolTimeout:
+            # 本地连接池耗尽，与代理本身无关；探测作废，下次再放行
+            ok = None
+            with self._lock:
+                if health := self._health.get(proxy):
+                    health.probe_deadline = 0.0
+            raise
+        except httpx.TransportError:
+            ok = False
+            raise
+        finally:
+            if ok is not None:
+                self.record(proxy, ok, self.clock() - started if ok else None)
+
+    def stats(self) -> Dict[Optional[str], ProxyHealth]:
+        with self._lock:
+            return {proxy: ProxyHealth(**vars(h)) for proxy, h in self._health.items()}
@@ -0,0 +1,57 @@
+import time
+
+from src.platforms.twitter.accounts import AccountScheduler, account_id
+
+
+def test_failing_account_is_ranked_last():
+    scheduler = AccountScheduler(["a", "b", "c"])
+    for _ in range(5):
+        scheduler.record("a", True, latency=0.2)
+        scheduler.record("b", False, latency=0.2)
+        scheduler.record("c", True, latency=0.2)
+    scheduler.record("c", False, status_code=429)
+    assert scheduler.ranked() == ["a", "c", "b"]
+
+
+def test_exhausted_quota_ranks_below_healthy_account():
+    scheduler = AccountScheduler(["a", "b"])
+    scheduler.record("a", True)
+    scheduler.record(
+        "a",
+        True,
+        headers={
+            "x-rate-limit-remaining": "0",
+            "x-rate-limit-reset": str(time.time() + 600),
+        },
+    )
+    scheduler.record("b", False)
+    assert scheduler.ranked() == ["b", "a"]
+
+
+def test_quarantine_is_persisted_and_released(tmp_path):
+    path = tmp_path / "accounts.json"
+    scheduler = AccountScheduler(["a", "b"], path)
+    scheduler.quarantine("a", "locked (326)")
+    assert scheduler.ranked() == ["b"]
+
+    reopened = AccountScheduler(["a", "b"], path)
+    assert reopened.ranked() == ["b"]
+    assert reopened.stats()[account_id("a")]["quarantined"] == "locked (326)"
+    # 状态文件只保存账号 id，不保存 cookie 本身
+    assert '"a"' not in path.read_text()
+
+    reopened.release("a")
+    assert AccountScheduler(["a", "b"], path).ranked() == ["a", "b"]
+
+
+def test_unknown_keys_are_ignored():
+    scheduler = AccountScheduler(["a"])
+    scheduler.record("z", False)
+    scheduler.quarantine("z", "locked")
+    assert scheduler.ranked() == ["a"]
+
+
+def test_unreadable_state_is_ignored(tmp_path):
+    path = tmp_path / "accounts.json"
+    path.write_text("{not json")
+    assert AccountScheduler(["a"], path).ranked() == ["a"]
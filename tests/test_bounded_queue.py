@@ -0,0 +1,85 @@
+import threading
+from queue import Full
+
+import pytest
+
+pytest.importorskip("DrissionPage")
+pytest.importorskip("tqdm")
+
+from src.platforms.base import BoundedQueue, estimate_size  # noqa: E402
+
+
+class Sized:
+    def __init__(self, nbytes: int):
+        self.nbytes = nbytes
+
+
+def test_item_cap():
+    queue = BoundedQueue(maxsize=2)
+    queue.put({"rest_id": "1"})
+    queue.put({"rest_id": "2"})
+    with pytest.raises(Full):
+        queue.put({"rest_id": "3"}, block=False)
+
+
+def test_byte_cap_accounting():
+    queue = BoundedQueue(max_bytes=100)
+    queue.put(Sized(60))
+    with pytest.raises(Full):
+        queue.put(Sized(50), block=False)
+    queue.put(Sized(40), block=False)
+    assert queue.bytes == 100
+
+    queue.get()
+    assert queue.bytes == 40
+    queue.put(Sized(50), block=False)
+    assert queue.bytes == 90
+
+
+def test_oversized_item_fits_an_empty_queue():
+    queue = BoundedQueue(max_bytes=10)
+    queue.put(Sized(1000), block=False)
+    with pytest.raises(Full):
+        queue.put(Sized(1), block=False)
+    queue.get()
+    assert queue.bytes == 0
+
+
+def test_stop_sentinel_takes_no_bytes():
+    queue = BoundedQueue(max_bytes=10)
+    queue.put(Sized(10))
+    queue.put(None, block=False)
+    assert queue.bytes == 10
+
+
+def test_put_times_out_and_wakes_up_on_get():
+    queue = BoundedQueue(max_bytes=10)
+    queue.put(Sized(10))
+    with pytest.raises(Full):
+        queue.put(Sized(5), timeout=0.01)
+
+    threading.Timer(0.05, queue.get).start()
+    queue.put(Sized(5), timeout=2)
+    assert queue.bytes == 5
+
+
+def test_estimate_size_prefers_nbytes():
+    assert estimate_size(Sized(7)) == 7
+    assert estimate_size({"a": "bc"}) == len('{"a": "bc"}')
+
+
+def test_job_tasks_reuse_the_job_size():
+    from src.platforms.dag import Job, JobTask, Node
+
+    nodes = [Node("replies", "reply", print), Node("save", "persist", print)]
+    job = Job({"rest_id": "1", "text": "x" * 100}, nodes)
+    first = JobTask(job, nodes[0])
+    size = estimate_size(first)
+    assert size == estimate_size(job.task)
+
+    job.task["replies"] = ["y" * 1000]
+    assert estimate_size(JobTask(job, nodes[1])) == size
+
+    # 节点完成后结果已写入任务，重新测量一次
+    job.finish("replies", True)
+    assert estimate_size(JobTask(job, nodes[1])) == estimate_size(job.task) > 1000
@@ -0,0 +1,131 @@
+import httpx
+import pytest
+
+from src.service.circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    CircuitState,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def breaker(clock):
+    def make(**kwargs) -> CircuitBreaker:
+        options = dict(
+            failure_rate=0.5, min_calls=4, window=4, open_seconds=30, clock=clock
+        )
+        return CircuitBreaker("TweetDetail", **{**options, **kwargs})
+
+    return make
+
+
+def outcomes(cb: CircuitBreaker, *results: bool):
+    for ok in results:
+        cb.check()
+        cb.record(ok)
+
+
+def test_opens_once_failure_rate_is_reached(breaker):
+    cb = breaker()
+    outcomes(cb, False, False, True)
+    assert cb.state is CircuitState.CLOSED
+    outcomes(cb, True)
+    assert cb.state is CircuitState.OPEN
+
+    with pytest.raises(CircuitOpenError) as e:
+        cb.check()
+    assert e.value.retry_after == 30
+
+
+def test_half_open_success_closes(clock, breaker):
+    cb = breaker()
+    outcomes(cb, False, False, False, False)
+    clock.now += 30
+    cb.check()
+    assert cb.state is CircuitState.HALF_OPEN
+    # 半开时只放行一个试探请求
+    with pytest.raises(CircuitOpenError):
+        cb.check()
+
+    cb.record(True)
+    assert cb.state is CircuitState.CLOSED
+    outcomes(cb, False, False, False)
+    assert cb.state is CircuitState.CLOSED
+
+
+def test_half_open_failure_reopens_for_longer(clock, breaker):
+    cb = breaker(max_open_seconds=90)
+    outcomes(cb, False, False, False, False)
+    clock.now += 30
+    outcomes(cb, False)
+    assert cb.state is CircuitState.OPEN
+    clock.now += 59
+    with pytest.raises(CircuitOpenError):
+        cb.check()
+
+    clock.now += 1
+    outcomes(cb, False)
+    # 打开时长翻倍但不超过 max_open_seconds
+    clock.now += 89
+    with pytest.raises(CircuitOpenError):
+        cb.check()
+    clock.now += 1
+    cb.check()
+    assert cb.state is CircuitState.HALF_OPEN
+
+
+def test_guard_classifies_outcomes(breaker):
+    cb = breaker(min_calls=1, window=1)
+    request = httpx.Request("GET", "https://x.com")
+
+    with pytest.raises(httpx.HTTPStatusError):
+        with cb.guard():
+            httpx.Response(404, request=request).raise_for_status()
+    assert cb.state is CircuitState.CLOSED
+
+    with cb.guard() as call:
+        call.fail()
+    assert cb.state is CircuitState.OPEN
+
+
+def test_guard_counts_server_errors(breaker):
+    cb = breaker(min_calls=1, window=1)
+    request = httpx.Request("GET", "https://x.com")
+    with pytest.raises(httpx.HTTPStatusError):
+        with cb.guard():
+            httpx.Response(503, request=request).raise_for_status()
+    with pytest.raises(CircuitOpenError):
+        with cb.guard():
+            pass
+
+
+def test_pool_timeout_records_nothing(clock, breaker):
+    cb = breaker(min_calls=1, window=1)
+    for _ in range(3):
+        with pytest.raises(httpx.PoolTimeout):
+            with cb.guard():
+                raise httpx.PoolTimeout("pool exhausted")
+    assert cb.state is CircuitState.CLOSED
+
+    outcomes(cb, False)
+    clock.now += 30
+    with pytest.raises(httpx.PoolTimeout):
+        with cb.guard():
+            raise httpx.PoolTimeout("pool exhausted")
+    # 半开的试探名额还给下一次调用
+    with cb.guard():
+        pass
+    assert cb.state is CircuitState.CLOSED
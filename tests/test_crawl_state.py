@@ -0,0 +1,55 @@
+from src.platforms.twitter.crawl_state import CrawlState
+
+
+def test_watermark_compares_sort_indexes_numerically(tmp_path):
+    state = CrawlState(tmp_path / "crawl_state.json")
+    assert not state.is_below_watermark("5")
+
+    state.complete("1000")
+    assert state.is_below_watermark("1000")
+    assert state.is_below_watermark("999")
+    assert not state.is_below_watermark("1001")
+    assert not state.is_below_watermark(None)
+
+
+def test_complete_keeps_watermark_of_empty_crawl(tmp_path):
+    path = tmp_path / "crawl_state.json"
+    state = CrawlState(path)
+    state.complete("1000")
+    state.complete(None)
+    assert CrawlState(path).watermark == "1000"
+
+
+def test_reset_forgets_watermark(tmp_path):
+    path = tmp_path / "crawl_state.json"
+    state = CrawlState(path)
+    state.complete("1000")
+    state.reset()
+    assert not path.exists()
+    assert CrawlState(path).watermark is None
+
+
+def test_checkpoint_survives_restart(tmp_path):
+    path = tmp_path / "crawl_state.json"
+    state = CrawlState(path)
+    state.complete("1000")
+    state.checkpoint("cursor-3", "2000")
+
+    resumed = CrawlState(path)
+    assert resumed.resuming
+    assert resumed.cursor == "cursor-3"
+    assert resumed.pending_watermark == "2000"
+    # 未完成的抓取不能提前推进水位线
+    assert resumed.watermark == "1000"
+
+
+def test_complete_drops_resume_point(tmp_path):
+    path = tmp_path / "crawl_state.json"
+    state = CrawlState(path)
+    state.checkpoint("cursor-3", "2000")
+    state.complete(state.pending_watermark)
+
+    finished = CrawlState(path)
+    assert not finished.resuming
+    assert finished.pending_watermark is None
+    assert finished.watermark == "2000"
@@ -0,0 +1,133 @@
+import threading
+from queue import Queue
+
+import pytest
+
+pytest.importorskip("DrissionPage")
+pytest.importorskip("tqdm")
+
+from src.platforms.dag import (  # noqa: E402
+    DagScheduler,
+    Job,
+    JobCheckpoint,
+    JobTask,
+    Node,
+)
+from src.platforms.retry import DeadLetterStore, RetryScheduler  # noqa: E402
+
+
+def noop(task):
+    pass
+
+
+def graph(func=noop):
+    return [
+        Node("replies", "reply", func),
+        Node("media", "download", func),
+        Node("translate", "translate", func, deps=("replies",)),
+        Node("save", "persist", func, deps=("translate", "media"), always=True),
+    ]
+
+
+def test_job_releases_nodes_in_dependency_order():
+    job = Job({"rest_id": "1"}, graph())
+    ready, completed = job.start()
+    assert sorted(n.name for n in ready) == ["media", "replies"]
+    assert not completed
+
+    ready, _ = job.finish("replies", True)
+    assert [n.name for n in ready] == ["translate"]
+    ready, _ = job.finish("translate", True)
+    assert ready == []
+    ready, _ = job.finish("media", True)
+    assert [n.name for n in ready] == ["save"]
+    assert job.finish("save", True) == ([], True)
+    assert job.succeeded == {"replies", "media", "translate", "save"}
+
+
+def test_failed_dependency_skips_branch_but_not_always_nodes():
+    job = Job({"rest_id": "1"}, graph())
+    job.start()
+    ready, _ = job.finish("replies", False)
+    # translate 被跳过，save 仍需等待 media
+    assert ready == []
+    assert "translate" in job.failed
+    ready, _ = job.finish("media", True)
+    assert [n.name for n in ready] == ["save"]
+
+
+def test_skipped_nodes_are_not_run_again():
+    job = Job({"rest_id": "1"}, graph(), skip={"replies", "translate", "missing"})
+    ready, _ = job.start()
+    assert [n.name for n in ready] == ["media"]
+    assert job.done == {"replies", "translate"}
+
+
+def run_queues(scheduler, queues, running):
+    def worker(queue):
+        while running.is_set():
+            try:
+                scheduler.run(queue.get(timeout=0.05))
+            except Exception:
+                continue
+
+    threads = [
+        threading.Thread(target=worker, args=(q,), daemon=True) for q in queues.values()
+    ]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def test_scheduler_retries_and_dead_letters(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.platforms.dag.backoff_delay", lambda attempt: 0)
+    calls = []
+
+    def flaky(task):
+        calls.append(task["rest_id"])
+        if task["rest_id"] == "bad" or len(calls) == 1:
+            raise RuntimeError("boom")
+
+    kinds = {"reply", "download", "translate", "persist"}
+    queues = {kind: Queue() for kind in kinds}
+    running = threading.Event()
+    running.set()
+    retry = RetryScheduler()
+    dead = DeadLetterStore(tmp_path / "dead_letters.jsonl")
+    scheduler = DagScheduler(queues, running, retry, max_attempts=2, dead_letters=dead)
+    nodes = [
+        Node("replies", "reply", flaky),
+        Node("save", "persist", noop, deps=("replies",)),
+    ]
+    run_queues(scheduler, queues, running)
+
+    good = scheduler.submit({"rest_id": "good"}, nodes)
+    bad = scheduler.submit({"rest_id": "bad"}, nodes)
+    assert scheduler.join(timeout=0.05)
+    running.clear()
+    retry.stop()
+
+    assert calls.count("bad") == 2
+    assert good.succeeded == {"replies", "save"}
+    assert bad.failed == {"replies", "save"}
+    assert [(e["rest_id"], e["step"]) for e in dead.entries()] == [("bad", "replies")]
+
+
+def test_checkpoint_round_trip(tmp_path):
+    checkpoint = JobCheckpoint(tmp_path / "inflight.jsonl")
+    assert checkpoint.load() == []
+
+    job = Job({"rest_id": "1", "replies": []}, graph())
+    job.start()
+    job.finish("replies", True)
+    job.finish("media", False)
+    checkpoint.save([job])
+
+    assert checkpoint.load() == [({"rest_id": "1", "replies": []}, {"replies"})]
+    checkpoint.clear()
+    assert not checkpoint.path.exists()
+
+
+def test_job_task_names_node():
+    job = Job({"rest_id": "9"}, graph())
+    assert str(JobTask(job, job.nodes["media"])) == "9:media"
@@ -0,0 +1,64 @@
+import itertools
+import time
+
+import pytest
+
+from src.platforms.twitter.guest_tokens import GuestTokenPool
+
+
+def counter_fetch():
+    counter = itertools.count(1)
+    return lambda: f"token-{next(counter)}"
+
+
+def wait_for(predicate, timeout: float = 2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+def test_tokens_are_handed_out_round_robin():
+    pool = GuestTokenPool(counter_fetch(), size=3)
+    pool.acquire()
+    wait_for(lambda: len(pool.stats()) == 3)
+    values = [pool.acquire() for _ in range(6)]
+    pool.stop()
+    assert sorted(set(values)) == ["token-1", "token-2", "token-3"]
+    assert values[:3] == values[3:]
+
+
+def test_used_up_token_is_replaced():
+    pool = GuestTokenPool(counter_fetch(), size=1, max_uses=5, refresh_ratio=0.6)
+    assert {pool.acquire() for _ in range(3)} == {"token-1"}
+    # 达到 refresh_ratio 后后台线程提前换上新 token
+    wait_for(lambda: pool.acquire() == "token-2")
+    pool.stop()
+
+
+def test_token_is_dropped_at_max_uses():
+    pool = GuestTokenPool(counter_fetch(), size=1, max_uses=2, refresh_ratio=1)
+    assert pool.acquire() == "token-1"
+    assert pool.acquire() == "token-1"
+    assert pool.acquire() == "token-2"
+    pool.stop()
+
+
+def test_invalidated_token_is_not_handed_out():
+    pool = GuestTokenPool(counter_fetch(), size=1)
+    token = pool.acquire()
+    pool.invalidate(token)
+    assert pool.acquire() != token
+    pool.stop()
+
+
+def test_acquire_times_out_while_fetching_fails():
+    def fail():
+        raise ConnectionError("token endpoint down")
+
+    pool = GuestTokenPool(fail)
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.1)
+    pool.stop()
+    with pytest.raises(RuntimeError):
+        pool.acquire(timeout=0.1)
@@ -0,0 +1,69 @@
+from src.platforms.twitter.index import Stage, TweetIndex
+
+
+def test_mark_accumulates_stages(tmp_path):
+    index = TweetIndex(tmp_path / "index.bin")
+    assert index.created
+    index.mark("100", Stage.REPLIES)
+    index.mark("100", Stage.MEDIA)
+
+    assert "100" in index
+    assert index.stages("100") == Stage.REPLIES | Stage.MEDIA
+    assert not index.is_saved("100")
+    assert "101" not in index
+    assert index.stages("101") == Stage(0)
+    assert len(index) == 1
+
+
+def test_non_numeric_ids_are_not_indexed(tmp_path):
+    index = TweetIndex(tmp_path / "index.bin")
+    index.mark("ad", Stage.SAVED)
+    index.mark("", Stage.SAVED)
+    assert "ad" not in index
+    assert len(index) == 0
+
+
+def test_grow_keeps_every_entry(tmp_path):
+    index = TweetIndex(tmp_path / "index.bin")
+    ids = [str(10**18 + i * 7919) for i in range(TweetIndex.MIN_CAPACITY)]
+    index.mark_all(ids[::2], Stage.SAVED)
+    index.mark_all(ids[1::2], Stage.TRANSLATED)
+
+    assert index.capacity > TweetIndex.MIN_CAPACITY
+    assert len(index) == len(ids)
+    assert all(index.is_saved(i) for i in ids[::2])
+    assert all(index.stages(i) == Stage.TRANSLATED for i in ids[1::2])
+
+
+def test_reopen_reads_entries_from_disk(tmp_path):
+    path = tmp_path / "index.bin"
+    index = TweetIndex(path)
+    ids = [str(i) for i in range(1, 3000)]
+    index.mark_all(ids, Stage.SAVED)
+    capacity = index.capacity
+    index.close()
+
+    reopened = TweetIndex(path)
+    assert not reopened.created
+    assert len(reopened) == len(ids)
+    assert reopened.capacity == capacity
+    assert all(reopened.is_saved(i) for i in ids)
+    reopened.close()
+
+
+def test_reset_drops_entries(tmp_path):
+    index = TweetIndex(tmp_path / "index.bin")
+    index.mark_all((str(i) for i in range(1, 5000)), Stage.SAVED)
+    index.reset()
+
+    assert len(index) == 0
+    assert index.capacity == TweetIndex.MIN_CAPACITY
+    assert "1" not in index
+
+
+def test_closed_index_ignores_lookups(tmp_path):
+    index = TweetIndex(tmp_path / "index.bin")
+    index.mark("1", Stage.SAVED)
+    index.close()
+    assert "1" not in index
+    index.mark("2", Stage.SAVED)
@@ -0,0 +1,111 @@
+import httpx
+import pytest
+
+from src.service.proxy_manager import ProxyManager
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def fail(manager: ProxyManager, proxy, times: int):
+    for _ in range(times):
+        manager.record(proxy, False)
+
+
+def test_picks_are_weighted_by_latency(clock):
+    manager = ProxyManager(["fast", "slow"], clock=clock)
+    manager.record("fast", True, 0.05)
+    manager.record("slow", True, 5.0)
+    picks = [manager.choose() for _ in range(500)]
+    assert picks.count("fast") > 400
+
+
+def test_failing_proxy_is_ejected_and_probed(clock):
+    manager = ProxyManager(["a", "b"], clock=clock, max_failures=3, eject_base=30)
+    fail(manager, "a", 3)
+    assert {manager.choose() for _ in range(50)} == {"b"}
+
+    clock.now += 30
+    assert manager.choose() == "a"
+    # 探测进行中时不再把流量分给它
+    assert {manager.choose() for _ in range(50)} == {"b"}
+
+    manager.record("a", True, 0.1)
+    assert "a" in {manager.choose() for _ in range(200)}
+
+
+def test_failed_probe_doubles_ejection(clock):
+    manager = ProxyManager(["a", "b"], clock=clock, max_failures=1, eject_base=30)
+    fail(manager, "a", 1)
+    clock.now += 30
+    assert manager.choose() == "a"
+    fail(manager, "a", 1)
+    assert manager.stats()["a"].ejected_until == clock.now + 60
+
+
+def test_probe_without_result_expires(clock):
+    manager = ProxyManager(
+        ["a", "b"], clock=clock, max_failures=1, eject_base=30, probe_timeout=10
+    )
+    fail(manager, "a", 1)
+    clock.now += 30
+    assert manager.choose() == "a"
+
+    clock.now += 10
+    manager.choose()
+    health = manager.stats()["a"]
+    assert health.probe_deadline == 0
+    assert health.ejections == 2
+
+    clock.now += 60
+    assert manager.choose() == "a"
+
+
+def test_all_ejected_falls_back_to_soonest(clock):
+    manager = ProxyManager(["a", "b"], clock=clock, max_failures=1, eject_base=30)
+    fail(manager, "a", 1)
+    clock.now += 1
+    fail(manager, "b", 1)
+    assert manager.choose() == "a"
+
+
+def test_track_counts_transport_errors_only(clock):
+    manager = ProxyManager(["a"], clock=clock, max_failures=1)
+    with pytest.raises(httpx.ConnectError):
+        with manager.track("a"):
+            raise httpx.ConnectError("refused")
+    assert manager.stats()["a"].ejections == 1
+
+    manager = ProxyManager(["a"], clock=clock, max_failures=1)
+    request = httpx.Request("GET", "https://x.com")
+    response = httpx.Response(500, request=request)
+    with pytest.raises(httpx.HTTPStatusError):
+        with manager.track("a"):
+            response.raise_for_status()
+    assert manager.stats()["a"].ejections == 0
+
+
+def test_pool_timeout_is_not_held_against_the_proxy(clock):
+    manager = ProxyManager(["a", "b"], clock=clock, max_failures=1, eject_base=30)
+    fail(manager, "a", 1)
+    clock.now += 30
+    assert manager.choose() == "a"
+    with pytest.raises(httpx.PoolTimeout):
+        with manager.track("a"):
+            raise httpx.PoolTimeout("pool exhausted")
+
+    health = manager.stats()["a"]
+    assert health.ejections == 1
+    assert health.error_rate == pytest.approx(0.2)
+    # 探测作废后下一次选择重新放行
+    assert manager.choose() == "a"
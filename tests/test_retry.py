@@ -0,0 +1,59 @@
+import threading
+
+from src.platforms.retry import DeadLetterStore, RetryScheduler, backoff_delay
+
+
+def _fail(store: DeadLetterStore, rest_id: str, step: str = "media"):
+    store.add(rest_id, step, RuntimeError("boom"), 3)
+
+
+def test_take_keeps_entries_until_replay_finishes(tmp_path):
+    store = DeadLetterStore(tmp_path / "dead_letters.jsonl")
+    _fail(store, "1")
+    _fail(store, "2")
+
+    assert [e["rest_id"] for e in store.take()] == ["1", "2"]
+    assert len(store) == 0
+    assert store.replaying.exists()
+
+    store.finish_replay()
+    assert not store.replaying.exists()
+    assert store.take() == []
+
+
+def test_interrupted_replay_is_handed_out_again(tmp_path):
+    store = DeadLetterStore(tmp_path / "dead_letters.jsonl")
+    _fail(store, "1")
+    store.take()
+    # 重放中途又失败的任务写回主文件
+    _fail(store, "2")
+
+    reopened = DeadLetterStore(tmp_path / "dead_letters.jsonl")
+    assert [e["rest_id"] for e in reopened.take()] == ["1", "2"]
+    assert not reopened.path.exists()
+
+
+def test_entry_records_error(tmp_path):
+    store = DeadLetterStore(tmp_path / "dead_letters.jsonl")
+    _fail(store, "7", "translate")
+    (entry,) = store.entries()
+    assert entry["step"] == "translate"
+    assert entry["attempts"] == 3
+    assert entry["error"] == "RuntimeError: boom"
+    assert "RuntimeError" in entry["traceback"]
+
+
+def test_scheduler_runs_callbacks_in_due_order():
+    scheduler = RetryScheduler()
+    calls = []
+    done = threading.Event()
+    scheduler.call_later(0.05, lambda: (calls.append("late"), done.set()))
+    scheduler.call_later(0, lambda: calls.append("early"))
+    assert done.wait(2)
+    scheduler.stop()
+    assert calls == ["early", "late"]
+
+
+def test_backoff_delay_is_capped():
+    assert [backoff_delay(n) for n in (1, 2, 3)] == [5, 10, 20]
+    assert backoff_delay(20) == 300
@@ -0,0 +1,144 @@
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("returns")
+
+from src.platforms.twitter.store import TweetStore  # noqa: E402
+
+
+def tweet(rest_id: str, **fields):
+    return {"rest_id": rest_id, "text": f"tweet {rest_id}", **fields}
+
+
+def saved_ids(store: TweetStore):
+    with open(store.data_path, encoding="utf-8") as f:
+        return [r["rest_id"] for r in json.load(f)["results"]]
+
+
+def test_journaled_tweets_survive_a_crash(tmp_path):
+    store = TweetStore(tmp_path)
+    store.append(tweet("1"))
+    store.append(tweet("ad"))
+    store.append(tweet("2"))
+
+    reopened = TweetStore(tmp_path)
+    assert [r["rest_id"] for r in reopened.records()] == ["1", "2"]
+    assert reopened.journal_ids == ["1", "2"]
+
+
+def test_compact_folds_journal_into_data_file(tmp_path):
+    store = TweetStore(tmp_path)
+    store.append(tweet("1", lang=None))
+    store.compact({"item": "me.Likes"})
+
+    assert not store.journal_path.exists()
+    assert not store.compacting_path.exists()
+    assert saved_ids(store) == ["1"]
+    assert store.journal_ids == []
+    with open(store.data_path, encoding="utf-8") as f:
+        data = json.load(f)
+    assert data["metadata"] == {"item": "me.Likes"}
+    assert "lang" not in data["results"][0]
+
+    store.append(tweet("2"))
+    reopened = TweetStore(tmp_path)
+    assert [r["rest_id"] for r in reopened.records()] == ["2", "1"]
+    assert reopened.metadata == {"item": "me.Likes"}
+
+
+def test_appends_continue_while_compacting(tmp_path, monkeypatch):
+    store = TweetStore(tmp_path)
+    store.append(tweet("1"))
+    writing = threading.Event()
+    release = threading.Event()
+    write_lines = store._write_lines
+
+    def slow_write(metadata, lines):
+        writing.set()
+        assert release.wait(2)
+        write_lines(metadata, lines)
+
+    monkeypatch.setattr(store, "_write_lines", slow_write)
+    store.compact(background=True)
+    assert writing.wait(2)
+    # 压缩写文件时不持锁，新记录照常写入新的 journal
+    store.append(tweet("2"))
+    release.set()
+    store.wait()
+
+    assert saved_ids(store) == ["1"]
+    assert store.journal_ids == ["2"]
+    store.close()
+    reopened = TweetStore(tmp_path)
+    assert [r["rest_id"] for r in reopened.records()] == ["2", "1"]
+
+
+def test_compaction_writes_records_as_persisted(tmp_path, monkeypatch):
+    store = TweetStore(tmp_path)
+    store.append(tweet("1"))
+    store.compact()
+    (record,) = TweetStore(tmp_path).records()
+    writing = threading.Event()
+    release = threading.Event()
+    write_lines = store._write_lines
+
+    def slow_write(metadata, lines):
+        writing.set()
+        assert release.wait(2)
+        write_lines(metadata, lines)
+
+    reopened = TweetStore(tmp_path)
+    monkeypatch.setattr(reopened, "_write_lines", slow_write)
+    reopened.compact(background=True)
+    assert writing.wait(2)
+    # 重跑时流水线会修改已保存的记录，压缩只写落盘时的内容
+    for saved in reopened.records():
+        saved["replies"] = [{"text": "new"}]
+    release.set()
+    reopened.wait()
+
+    assert TweetStore(tmp_path).records() == [record]
+
+
+def test_interrupted_compaction_keeps_moved_journal(tmp_path, monkeypatch):
+    store = TweetStore(tmp_path)
+    store.append(tweet("1"))
+
+    def crash(metadata, lines):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store, "_write_lines", crash)
+    store.compact()
+    assert store.compacting_path.exists()
+    store.append(tweet("2"))
+    store.close()
+
+    reopened = TweetStore(tmp_path)
+    assert sorted(r["rest_id"] for r in reopened.records()) == ["1", "2"]
+    reopened.compact()
+    assert sorted(saved_ids(reopened)) == ["1", "2"]
+    assert not reopened.compacting_path.exists()
+
+
+def test_torn_journal_line_is_skipped(tmp_path):
+    store = TweetStore(tmp_path)
+    store.append(tweet("1"))
+    store.close()
+    with open(store.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"rest_id": "2", "te')
+
+    reopened = TweetStore(tmp_path)
+    assert [r["rest_id"] for r in reopened.records()] == ["1"]
+    reopened.append(tweet("3"))
+    reopened.close()
+    assert [r["rest_id"] for r in TweetStore(tmp_path).records()] == ["1", "3"]
+
+
+def test_write_replaces_everything(tmp_path):
+    store = TweetStore(tmp_path)
+    store.append(tweet("1"))
+    store.write({"metadata": {}, "results": [tweet("9")]})
+    assert not store.journal_path.exists()
+    assert [r["rest_id"] for r in TweetStore(tmp_path).records()] == ["9"]